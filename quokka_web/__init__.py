@@ -1 +1 @@
-from .agent import Agent
+from .agent import Agent, with_shared_playwright, current_playwright
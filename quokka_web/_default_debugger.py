@@ -0,0 +1,12 @@
+from gembox.debug_utils import Debugger
+
+DEFAULT_DEBUGGER = Debugger()
+"""
+the debugger of the browser managers and page interactors created without one, `Debugger()` registers a new logger
+on every construction, so they share this one instead.
+
+It is shared: `enable_debug()` (or any other change) on it changes the logging of all of them, pass your own `Debugger`
+to configure one of them alone.
+"""
+
+__all__ = ['DEFAULT_DEBUGGER']
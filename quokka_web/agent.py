@@ -1,14 +1,27 @@
-from typing import List, Optional, Callable, Union
+import asyncio
+import contextlib
+import logging
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Callable, Union, Awaitable, TypeVar, Set, FrozenSet, Dict
 
 import pathlib
 import playwright.async_api
 from gembox.debug_utils import Debugger
 from playwright.async_api import async_playwright, Playwright
 
-from .browser_mgr import SingleBrowserManager
+from .browser_mgr import SingleBrowserManager, SharedBrowserManager, BrowserPool, ContextPool
 from .page_interactor import PageInteractor
 from .data_extractor import DataExtractor
 
+T = TypeVar('T')
+
+BLOCKABLE_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+"""the resource types aborted when assets are blocked, see `Agent.set_block_assets`"""
+
+_playwright_cv: ContextVar[Optional[Playwright]] = ContextVar("quokka_pw", default=None)
+"""the playwright instance shared by all agents instantiated in the same async context"""
+
 
 class Agent:
     """
@@ -31,73 +44,180 @@ class Agent:
     - `_start_hook` is called after the agent is started, just before setting `self._is_running` to True.
     - `_stop_hook` is called after the agent is stopped, just before setting `self._is_running` to False.
     """
+    cache_selectors: bool = False
+    """whether `get_element(s)` reuse the resolved elements of a selector until the page navigates, the cached handles
+    are shared between calls, so do not dispose them"""
+    selectors: Dict[str, str] = {}
+    """named selectors used on every page, e.g. `{'row': 'tr.row'}`, their locators are built once per page"""
+
     def __init__(self,
-                 wright: Playwright,
-                 headless: bool,
-                 debug_tool: Debugger):
+                 wright: Optional[Playwright] = None,
+                 headless: bool = True,
+                 debug_tool: Optional[Debugger] = None,
+                 cdp_endpoint: Optional[str] = None,
+                 browser_pool: Optional[BrowserPool] = None,
+                 browser: Optional[playwright.async_api.Browser] = None,
+                 context_pool: Optional[ContextPool] = None):
         """
         Initialize the Agent.
 
-        **Note: Usually, you need to instantiate an agent by Calling `Agent.instantiate()` rather than `Agent()`**
+        The agent can be used directly as an async context manager, which starts it (and playwright, if needed)::
+
+            async with Agent(headless=True) as agent:
+                await agent.go("https://example.com")
 
-        :param wright: (Playwright) the playwright instance
+        :param wright: (Playwright, optional) the playwright instance, if None, the playwright instance of the current
+                       async context is used when starting, or a new one is started (and stopped with the agent)
         :param headless: (bool) whether the browser is headless
-        :param debug_tool: (Debugger) the debugger
+        :param debug_tool: (Debugger, optional) the debugger
+        :param cdp_endpoint: (str, optional) attach to a running Chromium through this CDP endpoint instead of launching one
+        :param browser_pool: (BrowserPool, optional) borrow a browser from this pool instead of launching one
+        :param browser: (Browser, optional) open the agent's context in this launched browser instead of launching one
+        :param context_pool: (ContextPool, optional) reuse a context of this pool instead of launching a browser
         """
-        assert isinstance(wright, Playwright), f"wright should be a Playwright instance, but got {wright.__class__.__name__}"
-        assert isinstance(debug_tool, Debugger), f"debug_tool should be a Debugger instance, but got {debug_tool.__class__.__name__}"
+        debug_tool = Debugger() if debug_tool is None else debug_tool
+        if __debug__:
+            # stripped under `python -O`, like asserts, but a wrong type is reported as a TypeError
+            if wright is not None and not isinstance(wright, Playwright):
+                raise TypeError(f"wright should be a Playwright instance, but got {wright.__class__.__name__}")
+            if not isinstance(debug_tool, Debugger):
+                raise TypeError(f"debug_tool should be a Debugger instance, but got {debug_tool.__class__.__name__}")
 
         self._wright = wright
+        self._owns_wright = False
         self._headless = headless
         self._debug_tool = debug_tool
-        self._browser_mgr = SingleBrowserManager(wright=wright, headless=headless, debug_tool=debug_tool)
+        self._cdp_endpoint = cdp_endpoint
+        self._browser_pool = browser_pool
+        self._browser = browser
+        self._context_pool = context_pool
+        self._browser_mgr = self._create_browser_mgr() if wright is not None else None
         self._page_interactor = None
         self._data_extractor = None
         self._is_running = False
+        self._chain_actions: Optional[List[dict]] = None
+        self._blocked_types: FrozenSet[str] = frozenset()
 
         # init hook
         self._init_hook()
 
     @classmethod
-    async def instantiate(cls, headless=True, debug_tool=None) -> 'Agent':
+    async def instantiate(cls,
+                          headless=True,
+                          debug_tool=None,
+                          cdp_endpoint: Optional[str] = None,
+                          browser_pool: Optional[BrowserPool] = None,
+                          browser: Optional[playwright.async_api.Browser] = None,
+                          context_pool: Optional[ContextPool] = None) -> 'Agent':
         """
-        Instantiate an agent.
+        Instantiate an agent with the playwright instance of the current async context (started if there is none).
+
+        **Note: kept for compatibility, `Agent(...)` is enough now, playwright is resolved when the agent starts**
 
         :param headless: (bool) whether the browser is headless
         :param debug_tool: (Debugger) the debugger
+        :param cdp_endpoint: (str, optional) attach to a running Chromium through this CDP endpoint instead of launching one
+        :param browser_pool: (BrowserPool, optional) borrow a browser from this pool instead of launching one
+        :param browser: (Browser, optional) open the agent's context in this launched browser instead of launching one
+        :param context_pool: (ContextPool, optional) reuse a context of this pool instead of launching a browser
         :return: (Agent) the agent instance
         """
-        wright = await (async_playwright().start())
-        debug_tool = Debugger() if debug_tool is None else debug_tool
-        instance = cls(wright=wright, headless=headless, debug_tool=debug_tool)
+        # reuse the playwright driver of the current async context, starting one costs a node subprocess
+        wright = _playwright_cv.get()
+        if wright is None:
+            wright = await (async_playwright().start())
+            _playwright_cv.set(wright)
+        instance = cls(wright=wright, headless=headless, debug_tool=debug_tool,
+                       cdp_endpoint=cdp_endpoint, browser_pool=browser_pool, browser=browser,
+                       context_pool=context_pool)
         return instance
 
-    async def start(self, viewport: dict = None, **kwargs):
+    def _create_browser_mgr(self) -> SingleBrowserManager:
+        """
+        Create the browser manager, once the playwright instance is known.
+
+        :return: (SingleBrowserManager) the browser manager
+        """
+        if self._cdp_endpoint is None and self._browser_pool is None and self._browser is None and self._context_pool is None:
+            return SingleBrowserManager(wright=self._wright, headless=self._headless, debug_tool=self._debug_tool)
+        # share a browser, the agent only owns its context and page
+        return SharedBrowserManager(wright=self._wright, headless=self._headless, debug_tool=self._debug_tool,
+                                    cdp_endpoint=self._cdp_endpoint, browser_pool=self._browser_pool,
+                                    browser=self._browser, context_pool=self._context_pool)
+
+    async def start(self,
+                    viewport: dict = None,
+                    block_assets: bool = False,
+                    allowed_types: Optional[Set[str]] = None,
+                    **kwargs):
+        """
+        Start the agent.
+
+        :param viewport: (dict) the viewport, default is {'width': 1360, 'height': 900}
+        :param block_assets: (bool) whether to abort the requests of images, media, fonts and stylesheets
+        :param allowed_types: (Set[str], optional) the resource types still loaded when `block_assets` is True
+        :param kwargs: (dict) the kwargs for `playwright.launch()`
+        :return: (None)
+        """
         if self.is_running:
             self.debug_tool.warn(f"{self.__class__.__name__} is already running. No need to start again")
             return
 
-        self.debug_tool.info(f"Starting {self.__class__.__name__}...")
-        await self.browser_mgr.start(viewport=viewport, **kwargs)
-        self._page_interactor = PageInteractor(page=self.page, debug_tool=self.debug_tool)
-        self._data_extractor = DataExtractor(page=self.page, debug_tool=self.debug_tool)
-        # start hook
-        await self._start_hook()
+        start_time = time.perf_counter()
+        if self._wright is None:
+            # reuse the playwright driver of the current async context, otherwise start one owned by this agent
+            self._wright = _playwright_cv.get()
+            if self._wright is None:
+                self._wright = await (async_playwright().start())
+                self._owns_wright = True
+            self._browser_mgr = self._create_browser_mgr()
+        try:
+            await self.browser_mgr.start(viewport=viewport, **kwargs)
+            self._blocked_types = frozenset()
+            if block_assets:
+                await self.set_block_assets(True, allowed_types=allowed_types)
+            # `page_interactor` and `data_extractor` are built on first use
+            # start hook
+            await self._start_hook()
+        except BaseException:
+            # `stop()` is never called for an agent which failed to start, so release what it got so far here
+            try:
+                if self.browser_mgr.is_running:
+                    await self.browser_mgr.close()
+            finally:
+                if self._owns_wright:
+                    await self._wright.stop()
+                    self._wright = None
+                    self._browser_mgr = None
+                    self._owns_wright = False
+            raise
         self._is_running = True
-        self.debug_tool.info(f"{self.__class__.__name__} started successfully")
+        if self.debug_tool.logger.isEnabledFor(logging.INFO):
+            self.debug_tool.info(f"{self.__class__.__name__} started successfully in {time.perf_counter() - start_time:.3f}s")
 
     async def stop(self):
         if self.is_running is False:
             self.debug_tool.warn("Agent is not running. No need to stop")
         else:
-            self.debug_tool.info(f"Stopping agent...")
+            stop_time = time.perf_counter()
+            if self._blocked_types:
+                # the context may be handed to another agent (see `ContextPool`), do not leave the route behind
+                await self.set_block_assets(False)
+            if self._page_interactor is not None:
+                self._page_interactor.detach()
             await self.browser_mgr.close()
             self._page_interactor = None
             self._data_extractor = None
             # stop hook
             await self._stop_hook()
+            if self._owns_wright:
+                await self._wright.stop()
+                self._wright = None
+                self._browser_mgr = None
+                self._owns_wright = False
             self._is_running = False
-            self.debug_tool.info(f"Agent stopped successfully")
+            if self.debug_tool.logger.isEnabledFor(logging.INFO):
+                self.debug_tool.info(f"Agent stopped successfully in {time.perf_counter() - stop_time:.3f}s")
 
     # page interactor related operation
     async def get_element(self, selector: str, strict: bool = False) -> playwright.async_api.ElementHandle:
@@ -117,16 +237,37 @@ class Agent:
         """
         return await self.page_interactor.get_elements(selector=selector)
 
+    async def get_elements_by_name(self, name: str) -> List[playwright.async_api.ElementHandle]:
+        """
+        Get the elements of a named selector, declared in the `selectors` class attribute.
+
+        :param name: (str) the name of the selector
+        :return: (List[playwright.async_api.ElementHandle]) the elements
+        """
+        return await self.page_interactor.get_elements_by_name(name=name)
+
+    def clear_selector_cache(self):
+        """
+        Drop the elements cached with `cache_selectors`, call it when the DOM changed without a navigation.
+
+        :return: (None)
+        """
+        self.page_interactor.clear_selector_cache()
+
     async def count(self, selector: str) -> int:
         """
         Count the number of elements according to the selector.
 
         :param selector: (str) the selector
-        :return: (int) the number of elements
+        :return: (int) the number of elements, `None` when enqueued into an open chain
         """
+        if self._chain_actions is not None:
+            return self._chain_actions.append({'op': 'count', 'selector': selector})
         return await self.page_interactor.count(selector=selector)
 
     async def click(self, selector: str):
+        if self._chain_actions is not None:
+            return self._chain_actions.append({'op': 'click', 'selector': selector})
         return await self.page_interactor.click(selector=selector)
 
     async def click_until_element_visible(self, click_selector: str, visible_selector: str, max_retry: int = 5):
@@ -147,6 +288,8 @@ class Agent:
         await self.page_interactor.scroll_to_top(elem=elem)
 
     async def scroll_by(self, x: int, y: int, elem: Optional[playwright.async_api.ElementHandle] = None):
+        if self._chain_actions is not None:
+            return self._chain_actions.append({'op': 'scrollBy', 'elem': elem, 'args': [x, y]})
         await self.page_interactor.scroll_by(x=x, y=y, elem=elem)
 
     async def scroll_to(self, x: int, y: int, elem: Optional[playwright.async_api.ElementHandle] = None):
@@ -157,7 +300,8 @@ class Agent:
                           load_wait: int = 40,
                           same_th: int = 20,
                           scroll_step_callbacks: Optional[List[Callable]] = None,
-                          elem: Optional[playwright.async_api.ElementHandle] = None) -> None:
+                          elem: Optional[playwright.async_api.ElementHandle] = None,
+                          wait_strategy: str = "sleep") -> None:
         """
         Scroll and load all contents, until scrolling top does not change.
 
@@ -166,13 +310,15 @@ class Agent:
         :param same_th: (int) The threshold of the number of same scroll top to stop scrolling.
         :param scroll_step_callbacks: (List[Callable]) A callback function to be called after each scroll.
         :param elem: (playwright.async_api.ElementHandler) The element to scroll. If None, scroll the whole page.
+        :param wait_strategy: (str) How to wait after each scroll, "sleep" waits `load_wait` ms, "networkidle" waits until no request is in flight, at most `load_wait` ms.
         :return:
         """
         await self.page_interactor.scroll_load(scroll_step=scroll_step,
                                                load_wait=load_wait,
                                                same_th=same_th,
                                                scroll_step_callbacks=scroll_step_callbacks,
-                                               elem=elem)
+                                               elem=elem,
+                                               wait_strategy=wait_strategy)
 
     async def scroll_load_selector(self,
                                    selector: str,
@@ -183,7 +329,8 @@ class Agent:
                                    scroll_step_callbacks: List[Callable] = None,
                                    log_interval: int = 100,
                                    count_check_interval: int = 5,
-                                   elem: Optional[playwright.async_api.ElementHandle] = None) -> List[playwright.async_api.ElementHandle]:
+                                   elem: Optional[playwright.async_api.ElementHandle] = None,
+                                   wait_strategy: str = "sleep") -> List[playwright.async_api.ElementHandle]:
         """
         Scroll and load all contents, until no new content is loaded or enough specific items are collected.
 
@@ -196,6 +343,7 @@ class Agent:
         :param log_interval: (int) The interval of logging the number of loaded elements.
         :param count_check_interval: (int) The interval of checking the number of loaded elements.
         :param elem: (ElementHandle) The element to scroll. If None, scroll the whole page.
+        :param wait_strategy: (str) How to wait after each scroll, "sleep" waits `load_wait` ms, "networkidle" waits until no request is in flight, at most `load_wait` ms.
 
         :return: (int) The number of elements matching the selector
         """
@@ -205,7 +353,39 @@ class Agent:
                                                                scroll_step_callbacks=scroll_step_callbacks,
                                                                log_interval=log_interval,
                                                                count_check_interval=count_check_interval,
-                                                               elem=elem)
+                                                               elem=elem,
+                                                               wait_strategy=wait_strategy)
+
+    async def scroll_load_selector_attrs(self,
+                                         selector: str,
+                                         attr: str,
+                                         threshold: Optional[int] = None,
+                                         scroll_step: int = 400,
+                                         load_wait: int = 40,
+                                         same_th: int = 20,
+                                         scroll_step_callbacks: List[Callable] = None,
+                                         log_interval: int = 100,
+                                         count_check_interval: int = 5,
+                                         elem: Optional[playwright.async_api.ElementHandle] = None,
+                                         wait_strategy: str = "sleep") -> List[str]:
+        """
+        Same as `scroll_load_selector`, but extract `attr` of the loaded elements inside the page.
+
+        :param selector: (str) The selector of the elements to load
+        :param attr: (str) The attribute to extract from each loaded element
+
+        Other parameters are the same as `scroll_load_selector`.
+
+        :return: (List[str]) The attribute values of the elements matching the selector
+        """
+        return await self.page_interactor.scroll_load_selector_attrs(selector=selector, attr=attr, threshold=threshold,
+                                                                     scroll_step=scroll_step, load_wait=load_wait,
+                                                                     same_th=same_th,
+                                                                     scroll_step_callbacks=scroll_step_callbacks,
+                                                                     log_interval=log_interval,
+                                                                     count_check_interval=count_check_interval,
+                                                                     elem=elem,
+                                                                     wait_strategy=wait_strategy)
 
     async def get_scroll_top(self, elem: playwright.async_api.ElementHandle = None) -> int:
         return await self.page_interactor.get_scroll_top(elem=elem)
@@ -213,9 +393,61 @@ class Agent:
     async def get_scroll_height(self, elem: playwright.async_api.ElementHandle = None) -> int:
         return await self.page_interactor.get_scroll_height(elem=elem)
 
+    async def get_scroll_state(self, selector: Optional[str] = None,
+                               elem: Optional[playwright.async_api.ElementHandle] = None) -> dict:
+        """
+        Get the scroll top, the scroll height and the number of elements matching `selector` in a single round-trip,
+        instead of calling `get_scroll_top`, `get_scroll_height` and `count` one by one.
+
+        :param selector: (str, optional) the selector to count, if None, the count is skipped and `n` is -1
+        :param elem: (ElementHandle, optional) the element, if None, the whole page
+        :return: (dict) `{'top': scroll top, 'h': scroll height, 'n': number of elements matching selector}`
+        """
+        return await self.page_interactor.get_scroll_state(selector=selector, elem=elem)
+
     async def type_input(self, selector: str, text: str):
+        if self._chain_actions is not None:
+            return self._chain_actions.append({'op': 'type', 'selector': selector, 'args': [text]})
         return await self.page_interactor.type_input(selector=selector, text=text)
 
+    async def chain(self, actions: List[dict]) -> dict:
+        """
+        Run a sequence of actions inside the page in a single round-trip, then observe the page.
+
+        See `PageInteractor.chain` for the format of the actions and the result.
+
+        :param actions: (List[dict]) the actions
+        :return: (dict) `{'results': [result of each action], 'observation': {...}}`
+        """
+        return await self.page_interactor.chain(actions=actions)
+
+    @contextlib.asynccontextmanager
+    async def chaining(self):
+        """
+        Open a chain: inside the `async with` block, `click`, `type_input`, `scroll_by` and `count` are enqueued
+        instead of being run, and they are all run by `chain` in one round-trip when the block exits.
+
+        Usage::
+
+            async with agent.chaining() as chain_result:
+                await agent.type_input("#search", "quokka")
+                await agent.click("#submit")
+                await agent.count(".result")
+            n_results = chain_result['results'][2]
+
+        :return: (dict) filled with the return value of `chain` when the block exits
+        """
+        if self._chain_actions is not None:
+            raise RuntimeError("A chain is already open, chains cannot be nested")
+        self._chain_actions = []
+        chain_result = {}
+        try:
+            yield chain_result
+            actions = self._chain_actions
+        finally:
+            self._chain_actions = None
+        chain_result.update(await self.chain(actions))
+
     async def download_html(self,
                             file_path: Union[str, pathlib.Path],
                             elem: Optional[playwright.async_api.ElementHandle] = None,
@@ -230,16 +462,104 @@ class Agent:
         """
         return await self.page_interactor.download_html(file_path=file_path, elem=elem, encoding=encoding)
 
+    async def download_mhtml(self, file_path: Union[str, pathlib.Path]):
+        """
+        Download the current web page as an MHTML snapshot, including its resources. Only available on Chromium.
+
+        :param file_path: (str, pathlib.Path) the file path
+        :return: (None)
+        """
+        return await self.page_interactor.download_mhtml(file_path=file_path)
+
     # browser mgr related operation
-    async def go(self, url: str, **kwargs):
+    async def go(self, url: str, wait_for: Optional[str] = None, **kwargs):
         """
         Go to the url.
 
+        By default, the agent proceeds as soon as the navigation is committed, instead of waiting for the `load` event.
+        If the navigation does not commit within the default timeout, the agent proceeds anyway, unless `wait_for` is
+        given (the wait would apply to the previous document). A `timeout` given by the caller raises as usual.
+
         :param url: (str) the url to go
-        :param kwargs: (dict) the kwargs for `playwright.Page.goto()`
+        :param wait_for: (str, optional) "dom" to also wait for the `domcontentloaded` event after the navigation
+        :param kwargs: (dict) the kwargs for `playwright.Page.goto()`, default `wait_until` is "commit" and `timeout` is 3000 ms
+        :return: (None)
+        """
+        assert wait_for in (None, "dom"), f"wait_for must be None or 'dom', got {wait_for}"
+        kwargs.setdefault('wait_until', 'commit')
+        default_timeout = 'timeout' not in kwargs
+        kwargs.setdefault('timeout', 3000)
+        try:
+            await self.browser_mgr.go(url=url, **kwargs)
+        except playwright.async_api.TimeoutError:
+            if not default_timeout or wait_for is not None:
+                raise
+            self.debug_tool.warn(f"Navigation to {url} not committed within {kwargs['timeout']} ms, proceeding anyway")
+        if wait_for == "dom":
+            await self.page.wait_for_load_state('domcontentloaded')
+
+    async def set_block_assets(self, block: bool, allowed_types: Optional[Set[str]] = None):
+        """
+        Turn asset blocking on or off for the following navigations.
+
+        When on, requests of the types in `BLOCKABLE_RESOURCE_TYPES` (except `allowed_types`) are aborted, which saves
+        most of the bytes of content-heavy pages without changing their DOM.
+
+        :param block: (bool) whether to block the assets
+        :param allowed_types: (Set[str], optional) the resource types still loaded when blocking
         :return: (None)
         """
-        return await self.browser_mgr.go(url=url, **kwargs)
+        if self.page is None:
+            raise RuntimeError(f"{self.__class__.__name__} is not running, please start it first")
+        was_blocking = bool(self._blocked_types)
+        self._blocked_types = BLOCKABLE_RESOURCE_TYPES - frozenset(allowed_types or ()) if block else frozenset()
+        # the route reads `self._blocked_types` on each request, so it is registered once and only toggled afterwards
+        if self._blocked_types and not was_blocking:
+            await self.page.context.route("**/*", self._route_assets)
+        elif not self._blocked_types and was_blocking:
+            await self.page.context.unroute("**/*", self._route_assets)
+
+    async def _route_assets(self, route: playwright.async_api.Route):
+        if route.request.resource_type in self._blocked_types:
+            await route.abort()
+        else:
+            # let the routes registered before this one handle the request too
+            await route.fallback()
+
+    async def go_many(self,
+                      urls: List[str],
+                      max_parallel: int = 3,
+                      per_url: Optional[Callable[[playwright.async_api.Page], Awaitable[T]]] = None,
+                      **kwargs) -> List[Union[T, BaseException]]:
+        """
+        Go to several urls in parallel, each in its own page (and context) of the agent's browser.
+
+        The agent's own page is left untouched, each url is opened in a new page which is closed once `per_url` is done.
+
+        :param urls: (List[str]) the urls to go
+        :param max_parallel: (int) the maximum number of pages open at the same time
+        :param per_url: (Callable, optional) the coroutine function called with the page of each url, after navigation
+        :param kwargs: (dict) the kwargs for `playwright.Page.goto()`, default `wait_until` is "domcontentloaded"
+        :return: (List) the return value of `per_url` (or `None`) for each url, in order, or the exception it raised
+        """
+        assert isinstance(max_parallel, int) and max_parallel > 0, f"max_parallel must be a positive integer, got {max_parallel}"
+        if not self.is_running:
+            raise RuntimeError(f"{self.__class__.__name__} is not running, please start it first")
+        kwargs.setdefault('wait_until', 'domcontentloaded')
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def _go_one(url: str):
+            async with semaphore:
+                # `Browser.new_page()` opens the page in a new context, so pages do not share cookies or storage
+                page = await self.browser_mgr.browser.new_page()
+                try:
+                    await page.goto(url=url, **kwargs)
+                    return await per_url(page) if per_url is not None else None
+                finally:
+                    await page.close()
+
+        self.debug_tool.info(f"Go to {len(urls)} urls, at most {max_parallel} in parallel...")
+        return await asyncio.gather(*[_go_one(url) for url in urls], return_exceptions=True)
 
     # getters
     @property
@@ -248,15 +568,23 @@ class Agent:
         return self._wright
 
     @property
-    def browser_mgr(self) -> SingleBrowserManager:
+    def browser_mgr(self) -> Optional[SingleBrowserManager]:
+        """the browser manager, None until the agent is started when it was created without `wright`"""
         return self._browser_mgr
 
     @property
     def page_interactor(self) -> PageInteractor:
+        """the page interactor, built on first access"""
+        if self._page_interactor is None and self.page is not None:
+            self._page_interactor = PageInteractor(page=self.page, debug_tool=self.debug_tool,
+                                                   cache_selectors=self.cache_selectors, selectors=self.selectors)
         return self._page_interactor
 
     @property
     def data_extractor(self) -> DataExtractor:
+        """the data extractor, built on first access"""
+        if self._data_extractor is None and self.page is not None:
+            self._data_extractor = DataExtractor(page=self.page, debug_tool=self.debug_tool)
         return self._data_extractor
 
     @property
@@ -264,8 +592,8 @@ class Agent:
         return self._is_running
 
     @property
-    def page(self) -> playwright.async_api.Page:
-        return self.browser_mgr.page
+    def page(self) -> Optional[playwright.async_api.Page]:
+        return self.browser_mgr.page if self.browser_mgr is not None else None
 
     @property
     def debug_tool(self) -> Debugger:
@@ -276,7 +604,8 @@ class Agent:
         """
         Hook function called at the end of the __init__ functions.
 
-        When calling this hook, the agent already has `self.wright`, `self.debug_tool` and `self.browser_mgr` equipped.
+        When calling this hook, the agent already has `self.debug_tool` equipped, and `self.wright` and `self.browser_mgr`
+        too if it was created with `wright`, otherwise they are equipped when the agent starts.
         :return: (None)
         """
         pass
@@ -307,4 +636,29 @@ class Agent:
         await self.stop()
 
 
-__all__ = ['Agent']
+def current_playwright() -> Optional[Playwright]:
+    """
+    Get the playwright instance shared in the current async context, see `with_shared_playwright`.
+
+    :return: (Playwright) the shared playwright instance, None if there is none
+    """
+    return _playwright_cv.get()
+
+
+async def with_shared_playwright(main: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run `main` with one playwright instance shared by all agents instantiated inside it, and stop it afterwards.
+
+    :param main: (Callable) the coroutine function to run
+    :return: the return value of `main`
+    """
+    wright = await (async_playwright().start())
+    token = _playwright_cv.set(wright)
+    try:
+        return await main()
+    finally:
+        _playwright_cv.reset(token)
+        await wright.stop()
+
+
+__all__ = ['Agent', 'with_shared_playwright', 'current_playwright', 'BLOCKABLE_RESOURCE_TYPES']
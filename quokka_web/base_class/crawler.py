@@ -1,14 +1,105 @@
 import abc
+import asyncio
 import logging
+import logging.handlers
 import pathlib
-import traceback
-from typing import List, Dict, Type
+import time
+from typing import List, Dict, Type, Tuple, FrozenSet, Optional
 
-from quokka_web import Agent
+import playwright.async_api
+
+from quokka_web import Agent, with_shared_playwright, current_playwright
+from quokka_web.browser_mgr import ContextPool
 from gembox.io import check_and_make_dir
-from gembox.multiprocess import Task, ParallelExecutor
 from gembox.debug_utils import Debugger, FileConsoleDebugger, FileDebugger
 
+_LOG_BUFFER_CAPACITY = 1024
+"""the number of log records of a crawl buffered before they are written to its log file"""
+
+_LOG_FLUSH_INTERVAL = 2.
+"""the maximum time, in seconds, a buffered log record waits before it is written, when more records follow"""
+
+_MISSING = object()
+"""sentinel for the optional fields missing from the crawl args"""
+
+_HARD_RESTART_EVERY = 2
+"""every this many failed attempts of a crawl, the crawler is restarted instead of only resetting its page"""
+
+
+class _TimedMemoryHandler(logging.handlers.MemoryHandler):
+    """
+    A `MemoryHandler` which also flushes once `flush_interval` seconds have passed since its last flush, so the log
+    file of a slow crawl keeps up with it instead of waiting for the buffer to fill.
+    """
+
+    def __init__(self, capacity: int, flush_interval: float, flushLevel=logging.ERROR, target=None):
+        super().__init__(capacity=capacity, flushLevel=flushLevel, target=target)
+        self._flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+
+    def shouldFlush(self, record: logging.LogRecord) -> bool:
+        return super().shouldFlush(record) or time.monotonic() - self._last_flush >= self._flush_interval
+
+    def flush(self):
+        super().flush()
+        self._last_flush = time.monotonic()
+
+
+class _SharedBrowser:
+    """
+    The browser shared by the crawls of `parallel_crawl`, with the pool of its contexts.
+
+    It is launched on first use, and launched again (with a new context pool) once it has crashed or disconnected, so
+    that the crawls restarted after a crash do not keep failing on the dead browser.
+    """
+
+    def __init__(self, headless: bool, max_contexts: int):
+        """
+        Initialize the _SharedBrowser.
+
+        :param headless: (bool) whether the browser is headless
+        :param max_contexts: (int) the maximum number of idle contexts kept in the pool
+        """
+        self._headless = headless
+        self._max_contexts = max_contexts
+        self._browser: Optional[playwright.async_api.Browser] = None
+        self._context_pool: Optional[ContextPool] = None
+        self._lock = asyncio.Lock()
+
+    async def context_pool(self) -> ContextPool:
+        """
+        Get the context pool of the running browser, (re)launching the browser if it is not connected.
+
+        :return: (ContextPool) the context pool
+        """
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                await self._close()
+                self._browser = await current_playwright().chromium.launch(headless=self._headless)
+                self._context_pool = ContextPool(browser=self._browser, max_size=self._max_contexts)
+            return self._context_pool
+
+    async def close(self):
+        """
+        Close the context pool and the browser.
+
+        :return: (None)
+        """
+        async with self._lock:
+            await self._close()
+
+    async def _close(self):
+        if self._browser is None:
+            return
+        try:
+            await self._context_pool.close()
+            await self._browser.close()
+        except playwright.async_api.Error:
+            # the browser is already gone
+            pass
+        self._browser = None
+        self._context_pool = None
+
 
 class BaseCrawler(abc.ABC):
     """
@@ -23,9 +114,16 @@ class BaseCrawler(abc.ABC):
     agent_cls: Type[Agent] = Agent
     """the browser agent class, it should be a subclass of `quokka_web.agent.Agent`"""
 
+    def __init_subclass__(cls, **kwargs):
+        # `agent_cls` is checked once, when the crawler class is defined, instead of on every `instantiate()`
+        super().__init_subclass__(**kwargs)
+        if not (isinstance(cls.agent_cls, type) and issubclass(cls.agent_cls, Agent)):
+            raise TypeError(f"agent_cls must be a subclass of `quokka_web.agent.Agent`, but got {cls.agent_cls!r} in {cls.__name__}")
+
     def __init__(self, browser_agent, debug_tool: Debugger):
         self._browser_agent = browser_agent
         self._debug_tool = debug_tool
+        self._ctx_depth = 0
 
     async def crawl(self, *args, **kwargs):
 
@@ -92,22 +190,24 @@ class BaseCrawler(abc.ABC):
         self.debug_tool.info(f"Stop {self.__class__.__name__} successfully")
 
     @classmethod
-    async def instantiate(cls, headless=False, debug_tool: Debugger = None) -> 'BaseCrawler':
+    async def instantiate(cls,
+                          headless=False,
+                          debug_tool: Debugger = None,
+                          browser: playwright.async_api.Browser = None,
+                          context_pool: ContextPool = None) -> 'BaseCrawler':
         """
         Instantiate a crawler instance.
 
         :param headless: (bool) Whether to run the browser in headless mode.
         :param debug_tool: (Debugger) The debugger instance.
+        :param browser: (Browser) A launched browser to open the crawler's context in, instead of launching one.
+        :param context_pool: (ContextPool) A pool to reuse a context from, instead of launching a browser.
 
         :return: (BaseCrawler) The crawler instance.
         """
-        if not hasattr(cls, 'agent_cls'):
-            raise NotImplementedError(f"agent_cls is not specified in {cls.__name__}, Please specify it first.")
-        assert issubclass(cls.agent_cls,
-                          Agent), f"agent_cls must be a subclass of `quokka_web.agent.Agent`, but got {cls.agent_cls.__name__}"
-
         debug_tool = Debugger() if debug_tool is None else debug_tool
-        browser_agent = await cls.agent_cls.instantiate(headless=headless, debug_tool=debug_tool)
+        browser_agent = await cls.agent_cls.instantiate(headless=headless, debug_tool=debug_tool, browser=browser,
+                                                        context_pool=context_pool)
         instance = cls(browser_agent=browser_agent, debug_tool=debug_tool)
         return instance
 
@@ -118,7 +218,8 @@ class BaseCrawler(abc.ABC):
                              headless: bool = True,
                              verbose: bool = False,
                              max_retry: int = 5,
-                             n_workers: int = 1) -> None:
+                             n_workers: int = 1,
+                             attempt_timeout: Optional[float] = None) -> None:
         """
         Parallel crawl function.
 
@@ -131,83 +232,197 @@ class BaseCrawler(abc.ABC):
         :param headless: (bool) Whether to run the browser in headless mode.
         :param verbose: (bool) Whether to print the log on the console.
         :param max_retry: (int) maximum number of retry for each crawl
-        :param n_workers: (int) Number of parallel workers.
+        :param n_workers: (int) Maximum number of crawls running at the same time.
+        :param attempt_timeout: (float, optional) the maximum time of one crawl attempt, in seconds, an attempt taking
+                                longer is cancelled and retried. If None, attempts are not limited.
         """
         # 1. Parameter validation, the key must be one of the async def crawl's parameters
         assert len(crawl_args_list) > 0, "The parameter list must not be empty."
-        for crawl_args in crawl_args_list:
-            cls._validate_crawl_args(**crawl_args)
+        assert isinstance(n_workers, int) and n_workers > 0, f"n_workers must be a positive integer, got {n_workers}"
+        cls._validate_crawl_args_list(crawl_args_list)
 
-        # 2. Create task parameters
+        # 2. Create task parameters, the log directory is created (and each log path built) once, here
+        log_dir = check_and_make_dir(log_dir)
         worker_args_list = [
             {
                 **crawl_args,
                 # we use __ variables to avoid name conflict with crawl_args
-                "_quokka_log_dir": log_dir,
+                "_quokka_log_path": log_dir / f"{cls._crawler_args_str(**crawl_args)}.log",
                 "_quokka_verbose": verbose,
                 "_quokka_headless": headless,
                 "_quokka_max_retry": max_retry,
+                "_quokka_attempt_timeout": attempt_timeout,
             }
             for crawl_args in crawl_args_list
         ]
 
-        tasks = [Task(cls._crawl_worker, params=worker_args) for worker_args in worker_args_list]
-        await ParallelExecutor.run(tasks, n_workers=n_workers)
+        # all crawls run in this event loop, sharing one playwright instance and one browser (relaunched if it
+        # crashes), and reusing the contexts of finished crawls, while at most `n_workers` of them are running at once
+        semaphore = asyncio.Semaphore(n_workers)
+
+        async def _run_all():
+            shared_browser = _SharedBrowser(headless=headless, max_contexts=n_workers)
+            try:
+                async def _run_one(worker_args: Dict):
+                    async with semaphore:
+                        await cls._crawl_worker(**worker_args, _quokka_shared_browser=shared_browser)
+
+                return await asyncio.gather(*[_run_one(worker_args) for worker_args in worker_args_list],
+                                            return_exceptions=True)
+            finally:
+                await shared_browser.close()
+
+        results = await with_shared_playwright(_run_all)
+        # the crawl errors are retried and logged by the workers, what is left here is raised once all crawls finished
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
 
     @classmethod
     async def _crawl_worker(cls,
-                            _quokka_log_dir: (str, pathlib.Path),
+                            _quokka_log_path: pathlib.Path,
                             _quokka_verbose: bool,
                             _quokka_headless: bool,
                             _quokka_max_retry: int = 5,
+                            _quokka_shared_browser: _SharedBrowser = None,
+                            _quokka_attempt_timeout: Optional[float] = None,
                             **crawl_args) -> None:
         """
         Generic crawler worker for building parallel crawler.
 
         **Note: This function should not be called directly. It is used by `parallel_crawl` function.**
 
-        :param _quokka_log_dir: (str, pathlib.Path) the directory to save the log
+        :param _quokka_log_path: (pathlib.Path) the log file, in an existing directory
         :param _quokka_verbose: (bool) whether to print the log to the console
         :param _quokka_headless: (bool) whether the browser is headless
         :param _quokka_max_retry: (int) maximum number of retry
+        :param _quokka_shared_browser: (_SharedBrowser) the browser shared by the crawls, if None, the crawl launches its own browser
+        :param _quokka_attempt_timeout: (float) the maximum time of one crawl attempt, in seconds, None for no limit
         :param crawl_args: (dict) the arguments for the crawler
         :return: (None)
         """
-        # 0. 参数检查
+        # 0. 参数检查, `crawl_args` are already validated by `parallel_crawl`
         assert isinstance(_quokka_max_retry,
                           int) and _quokka_max_retry > 0, f"max_retry must be a positive integer, got {_quokka_max_retry}"
-        cls._validate_crawl_args(**crawl_args)
 
-        # 1. 生成必要的变量及文件夹
-        file_name = cls._crawler_args_str(**crawl_args)  # 生成文件名, 用于命名 log 文件, html 文件
-        _quokka_log_dir = check_and_make_dir(_quokka_log_dir)
-        log_path = _quokka_log_dir / f"{file_name}.log"
-        debugger = FileConsoleDebugger(filepath=log_path, level=logging.DEBUG) if _quokka_verbose \
-            else FileDebugger(filepath=log_path, level=logging.DEBUG)
+        # 1. 生成 debugger, log 文件名由 `parallel_crawl` 生成
+        debugger = FileConsoleDebugger(filepath=_quokka_log_path, level=logging.DEBUG) if _quokka_verbose \
+            else FileDebugger(filepath=_quokka_log_path, level=logging.DEBUG)
+        log_buffers = cls._buffer_file_handlers(debugger)
+        try:
+            await cls._crawl_with_retry(debugger=debugger,
+                                        headless=_quokka_headless,
+                                        max_retry=_quokka_max_retry,
+                                        shared_browser=_quokka_shared_browser,
+                                        attempt_timeout=_quokka_attempt_timeout,
+                                        **crawl_args)
+        finally:
+            # flush the buffered records, and close the log file, which is not reused after the crawl
+            for log_buffer in log_buffers:
+                debugger.logger.removeHandler(log_buffer)
+                log_buffer.close()
+                log_buffer.target.close()
 
-        # 2. 可重试的抓取
+    @classmethod
+    async def _crawl_with_retry(cls,
+                                debugger: Debugger,
+                                headless: bool,
+                                max_retry: int,
+                                shared_browser: _SharedBrowser = None,
+                                attempt_timeout: Optional[float] = None,
+                                **crawl_args) -> None:
+        """
+        Crawl, and retry up to `max_retry` times when crawling fails.
+
+        :param debugger: (Debugger) the debugger of the crawl
+        :param headless: (bool) whether the browser is headless
+        :param max_retry: (int) maximum number of retry
+        :param shared_browser: (_SharedBrowser) the browser shared by the crawls, if None, the crawl launches its own browser
+        :param attempt_timeout: (float) the maximum time of one crawl attempt, in seconds, None for no limit
+        :param crawl_args: (dict) the arguments for the crawler
+        :return: (None)
+        """
         finished, n_retry = False, 0
-        while n_retry < _quokka_max_retry and not finished:
-            crawler = None
-            try:
-                crawler = await cls.instantiate(debug_tool=debugger, headless=_quokka_headless)
-                # core logic: `crawl` is called HERE!
-                async with crawler:
-                    await crawler.crawl(**crawl_args)
+        crawler = None
+        try:
+            while n_retry < max_retry and not finished:
+                try:
+                    # the crawler (and its browser context) is kept across retries, it is only started when needed
+                    if crawler is None:
+                        context_pool = await shared_browser.context_pool() if shared_browser is not None else None
+                        crawler = await cls.instantiate(debug_tool=debugger, headless=headless, context_pool=context_pool)
+                    if not crawler.is_running:
+                        await crawler.start()
+                    # core logic: `crawl` is called HERE! a hung attempt is cancelled after `attempt_timeout`
+                    await asyncio.wait_for(crawler.crawl(**crawl_args), timeout=attempt_timeout)
                     finished = True
+                except Exception as e:
+                    timed_out = isinstance(e, asyncio.TimeoutError)
+                    debugger.error(f"Error while crawling. Error: {e}")
+                    # `Debugger.error` takes no `exc_info`, the logger formats the traceback only if a handler emits the record
+                    debugger.logger.error("Traceback:", exc_info=True)
+                    debugger.warn(f"Retrying {n_retry + 1}/{max_retry}...")
+                    n_retry += 1
+                    if crawler is not None and crawler.is_running:
+                        # the page of a timed out attempt may still be busy, so it is not worth a soft reset
+                        try:
+                            await cls._reset_crawler(crawler, debugger=debugger,
+                                                     hard=timed_out or n_retry % _HARD_RESTART_EVERY == 0)
+                        except Exception as reset_error:
+                            # e.g. the shared browser crashed, the crawler is dropped below
+                            debugger.warn(f"Failed to stop the crawler. Error: {reset_error}")
+                    if shared_browser is not None and crawler is not None and (
+                            not crawler.is_running or not crawler.browser_agent.page.context.browser.is_connected()):
+                        # get a new crawler on the next attempt, from the shared browser relaunched if it has crashed
+                        crawler = None
+                debugger.info(f"Finished after {n_retry}/{max_retry} retrie, finished_flag: {finished}")
+        finally:
+            if crawler is not None and crawler.is_running:
+                await crawler.stop()
+
+    @staticmethod
+    async def _reset_crawler(crawler: 'BaseCrawler', debugger: Debugger, hard: bool) -> None:
+        """
+        Get a crawler ready for a retry after a failed crawl.
+
+        A soft reset navigates the page to `about:blank` and clears the cookies, keeping the browser context. A hard
+        reset (or a failed soft reset) stops the crawler, so that the next attempt starts it again.
+
+        :param crawler: (BaseCrawler) the running crawler
+        :param debugger: (Debugger) the debugger of the crawl
+        :param hard: (bool) whether to stop the crawler instead of resetting its page
+        :return: (None)
+        """
+        if not hard:
+            try:
+                page = crawler.browser_agent.page
+                await page.goto("about:blank")
+                await page.context.clear_cookies()
+                return
             except Exception as e:
-                if crawler is not None:
-                    debugger.info(f"Stopping crawler... in except")
-                    await crawler.stop()
-                else:
-                    debugger.info(f"Crawler is None... in except")
-                error_message = str(e)
-                stack_trace = traceback.format_exc()
-                debugger.error(f"Error while crawling. Error: {error_message}")
-                debugger.error(f"Stack Trace: {stack_trace}")
-                debugger.warn(f"Retrying {n_retry + 1}/{_quokka_max_retry}...")
-                n_retry += 1
-            debugger.info(f"Finished after {n_retry}/{_quokka_max_retry} retrie, finished_flag: {finished}")
+                debugger.warn(f"Failed to reset the page, restarting crawler. Error: {e}")
+        debugger.info("Stopping crawler... before retrying")
+        await crawler.stop()
+
+    @staticmethod
+    def _buffer_file_handlers(debugger: Debugger) -> List[_TimedMemoryHandler]:
+        """
+        Put the file handlers of the debugger behind memory handlers, so that records are written to the file in
+        batches instead of one write per record. Warnings and errors are written (with the records before them) at once,
+        and the buffer is also written every `_LOG_FLUSH_INTERVAL` seconds.
+
+        :param debugger: (Debugger) the debugger
+        :return: (List[_TimedMemoryHandler]) the memory handlers, to be closed when the debugger is not used anymore
+        """
+        log_buffers = []
+        for handler in list(debugger.logger.handlers):
+            if isinstance(handler, logging.FileHandler):
+                log_buffer = _TimedMemoryHandler(capacity=_LOG_BUFFER_CAPACITY, flush_interval=_LOG_FLUSH_INTERVAL,
+                                                 flushLevel=logging.WARNING, target=handler)
+                debugger.logger.removeHandler(handler)
+                debugger.logger.addHandler(log_buffer)
+                log_buffers.append(log_buffer)
+        return log_buffers
 
     @classmethod
     def _validate_crawl_args(cls, **crawl_args):
@@ -218,24 +433,38 @@ class BaseCrawler(abc.ABC):
         2. make sure there are no extra fields
         3. for optional_fields that are filled, make sure they're in proper type
         """
+        cls._check_crawl_args(crawl_args, *cls._fields_spec())
+
+    @classmethod
+    def _validate_crawl_args_list(cls, crawl_args_list: List[Dict]):
+        """
+        Validate the crawl arguments of many crawls, see `_validate_crawl_args`.
 
-        required_fields = cls.required_fields()
-        all_fields = cls.crawler_fields()
+        :param crawl_args_list: (list<dict>) List of parameter dictionaries
+        """
+        required_names, all_fields, field_types = cls._fields_spec()
+        for crawl_args in crawl_args_list:
+            cls._check_crawl_args(crawl_args, required_names, all_fields, field_types)
 
+    @staticmethod
+    def _check_crawl_args(crawl_args: Dict,
+                          required_names: FrozenSet[str],
+                          all_fields: dict,
+                          field_types: Tuple[Tuple[str, type], ...]):
         # 1. Check all required_fields are filled and in proper type
-        missing_fields = set(required_fields.keys()) - set(crawl_args.keys())
+        missing_fields = required_names - crawl_args.keys()
         if missing_fields:
             raise AssertionError(f"Missing required fields: {', '.join(missing_fields)}")
 
         # 2. Make sure there are no extra fields
-        extra_fields = set(crawl_args.keys()) - set(all_fields.keys())
+        extra_fields = crawl_args.keys() - all_fields.keys()
         if extra_fields:
             raise AssertionError(f"Unknown fields: {', '.join(extra_fields)}")
 
-        # 3. Check for proper types
-        for field_name, field_value in crawl_args.items():
-            expected_type = all_fields[field_name]
-            if not isinstance(field_value, expected_type):
+        # 3. Check for proper types, with a single lookup per field
+        for field_name, expected_type in field_types:
+            field_value = crawl_args.get(field_name, _MISSING)
+            if field_value is not _MISSING and not isinstance(field_value, expected_type):
                 raise AssertionError(
                     f"{field_name} should be {expected_type}, but got {type(field_value)}, value: {field_value}")
 
@@ -246,6 +475,21 @@ class BaseCrawler(abc.ABC):
             **cls.optional_fields(),
         }
 
+    @classmethod
+    def _fields_spec(cls) -> Tuple[FrozenSet[str], dict, Tuple[Tuple[str, type], ...]]:
+        """
+        The names of the required fields and all fields with their types, computed once per crawler class.
+
+        :return: (Tuple) the required field names, `crawler_fields()`, and its `(name, type)` pairs as a tuple
+        """
+        # looked up in the class's own `__dict__`, so a subclass never reuses the spec of its parent
+        spec = cls.__dict__.get('_quokka_fields_spec')
+        if spec is None:
+            all_fields = cls.crawler_fields()
+            spec = (frozenset(cls.required_fields().keys()), all_fields, tuple(all_fields.items()))
+            cls._quokka_fields_spec = spec
+        return spec
+
     # getters
     @property
     def browser_agent(self):
@@ -263,11 +507,16 @@ class BaseCrawler(abc.ABC):
         return self.browser_agent.is_running
 
     async def __aenter__(self):
-        await self.start()
+        # nested `async with` blocks share one start / stop, only the outermost block starts and stops the crawler
+        if self._ctx_depth == 0:
+            await self.start()
+        self._ctx_depth += 1
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.stop()
+        self._ctx_depth -= 1
+        if self._ctx_depth == 0:
+            await self.stop()
 
 
 __all__ = ['BaseCrawler']
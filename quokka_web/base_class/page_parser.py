@@ -1,8 +1,11 @@
 import abc
+import asyncio
+import functools
 import pathlib
-import traceback
 
-from bs4 import BeautifulSoup
+import aiofiles
+import lxml.html
+from bs4 import BeautifulSoup, SoupStrainer
 from gembox.debug_utils import Debugger
 from gembox.io import ensure_pathlib_path
 
@@ -11,22 +14,33 @@ from .exception import FailedToLoadWebpageException
 
 class PageParser(abc.ABC):
     """
-    The base class of all page parsers, built upon BeautifulSoup.
+    The base class of all page parsers, built upon lxml.
 
     Page Parser is responsible for reading webpages from local files, and parsing the webpages to get the information.
 
-    After `load_webpage`, you can always access the `soup` property to get the BeautifulSoup object.
+    After `load_webpage`, you can access the `tree` property to get the root `lxml.html.HtmlElement`, or the `soup`
+    property to get a BeautifulSoup object. Both are only built on first access, so a parser only pays for the one it uses.
     """
 
-    def __init__(self, debug_tool: Debugger = None, encoding="utf-8"):
+    def __init__(self, debug_tool: Debugger = None, encoding="utf-8", strainer: SoupStrainer = None):
+        """
+        Initialize the PageParser.
+
+        :param debug_tool: (Debugger) the debugger
+        :param encoding: (str) the encoding of the webpage files
+        :param strainer: (SoupStrainer) if given, the soup only contains the parts of the webpage matching it
+        """
         self._encoding = encoding
+        self._strainer = strainer
         self._debug_tool = debug_tool if debug_tool is not None else Debugger()
         self._file_path = None
+        self._content = None
+        self._tree = None
         self._soup = None
 
     def load_webpage(self, file_path: (str, pathlib.Path)):
         """
-        Load webpage from local file.
+        Load webpage from local file, it is parsed when `tree` or `soup` is first accessed.
 
         :param file_path: (str, pathlib.Path) the path to the local file
         :return: (None)
@@ -34,21 +48,60 @@ class PageParser(abc.ABC):
         self.debug_tool.info(f"[{self.__class__.__name__}] Loading webpage from {file_path}...")
         try:
             self._file_path = ensure_pathlib_path(file_path)
-            self._soup = self._read_webpage_from_file(file_path=file_path)
+            self._content = None
+            self._tree = None
+            self._soup = None
+            if not self._file_path.is_file():
+                raise FileNotFoundError(f"No such file: {file_path}")
             self.debug_tool.info(f"[{self.__class__.__name__}] Loaded webpage from {file_path} successfully")
         except Exception as e:
+            self._fail_to_load(file_path=file_path, error=e)
+
+    async def load_webpage_async(self, file_path: (str, pathlib.Path), parse_tree: bool = True):
+        """
+        Load webpage from local file, without blocking the event loop.
+
+        The file is read with aiofiles, so that other coroutines (e.g. concurrent crawls) keep running meanwhile.
+        If `parse_tree` is True, the tree is also parsed in the default executor, otherwise `tree` and `soup` are built
+        from the read content on first access.
+
+        :param file_path: (str, pathlib.Path) the path to the local file
+        :param parse_tree: (bool) whether to parse the tree now, in the default executor
+        :return: (None)
+        """
+        self.debug_tool.info(f"[{self.__class__.__name__}] Loading webpage from {file_path}...")
+        try:
+            self._file_path = ensure_pathlib_path(file_path)
+            self._tree = None
             self._soup = None
-            self._file_path = None
-            self.debug_tool.error(f"[{self.__class__.__name__}] Failed to load webpage from {file_path}, error: {str(e)}")
-            self.debug_tool.error(f"Traceback: {traceback.format_exc()}")
-            raise FailedToLoadWebpageException(f"Failed to load webpage from {file_path}")
-
-    def _read_webpage_from_file(self, file_path: (str, pathlib.Path)) -> BeautifulSoup:
-        self.debug_tool.info(f"[{self.__class__.__name__}] Reading webpage from {file_path}...")
-        with open(file_path, "r", encoding=self._encoding) as file:
-            content = file.read()
-        self.debug_tool.info(f"[{self.__class__.__name__}] Transforming {file_path} to BeautifulSoup...")
-        return BeautifulSoup(content, 'lxml')
+            async with aiofiles.open(self._file_path, mode="rb") as file:
+                self._content = await file.read()
+            if parse_tree:
+                self.debug_tool.info(f"[{self.__class__.__name__}] Parsing webpage from {file_path}...")
+                parser = lxml.html.HTMLParser(encoding=self._encoding)
+                self._tree = await asyncio.get_running_loop().run_in_executor(
+                    None, functools.partial(lxml.html.document_fromstring, self._content, parser=parser))
+            self.debug_tool.info(f"[{self.__class__.__name__}] Loaded webpage from {file_path} successfully")
+        except Exception as e:
+            self._fail_to_load(file_path=file_path, error=e)
+
+    def _fail_to_load(self, file_path: (str, pathlib.Path), error: Exception):
+        self._content = None
+        self._tree = None
+        self._soup = None
+        self._file_path = None
+        self.debug_tool.error(f"[{self.__class__.__name__}] Failed to load webpage from {file_path}, error: {str(error)}")
+        # `Debugger.error` takes no `exc_info`, the logger formats the traceback only if a handler emits the record
+        self.debug_tool.logger.error("Traceback:", exc_info=True)
+        raise FailedToLoadWebpageException(f"Failed to load webpage from {file_path}")
+
+    def _read_webpage_from_file(self, file_path: (str, pathlib.Path)) -> lxml.html.HtmlElement:
+        self.debug_tool.info(f"[{self.__class__.__name__}] Parsing webpage from {file_path}...")
+        parser = lxml.html.HTMLParser(encoding=self._encoding)
+        if self._content is not None:
+            return lxml.html.document_fromstring(self._content, parser=parser)
+        # lxml parses straight from the file, without decoding the whole webpage into a Python str first
+        return lxml.html.parse(str(file_path), parser=parser).getroot()
 
     @property
     def debug_tool(self) -> Debugger:
@@ -62,6 +115,46 @@ class PageParser(abc.ABC):
     def file_path(self) -> pathlib.Path:
         return self._file_path
 
+    @property
+    def tree(self) -> lxml.html.HtmlElement:
+        """the root element of the loaded webpage, parsed on first access"""
+        if self._tree is None and self._file_path is not None:
+            file_path = self._file_path
+            try:
+                self._tree = self._read_webpage_from_file(file_path=file_path)
+            except Exception as e:
+                self._fail_to_load(file_path=file_path, error=e)
+        return self._tree
+
     @property
     def soup(self) -> BeautifulSoup:
+        """the BeautifulSoup object of the loaded webpage, built on first access"""
+        if self._soup is None and self._file_path is not None:
+            self.debug_tool.info(f"[{self.__class__.__name__}] Transforming {self._file_path} to BeautifulSoup...")
+            if self._content is not None:
+                self._soup = BeautifulSoup(self._content, 'lxml', parse_only=self._strainer, from_encoding=self._encoding)
+            else:
+                with open(self._file_path, "r", encoding=self._encoding) as file:
+                    self._soup = BeautifulSoup(file.read(), 'lxml', parse_only=self._strainer)
         return self._soup
+
+    def unload(self):
+        """
+        Release the parsed webpage, instead of waiting for the garbage collector to free the trees.
+
+        :return: (None)
+        """
+        if self._soup is not None:
+            self._soup.decompose()
+        if self._tree is not None:
+            self._tree.clear()
+        self._soup = None
+        self._tree = None
+        self._content = None
+        self._file_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.unload()
@@ -1,4 +1,4 @@
-from .main import SingleBrowserManager
+from .main import SingleBrowserManager, SharedBrowserManager, BrowserPool, ContextPool
 
 
-__all__ = ['SingleBrowserManager']
+__all__ = ['SingleBrowserManager', 'SharedBrowserManager', 'BrowserPool', 'ContextPool']
@@ -1,13 +1,51 @@
-from typing import Union
+import asyncio
+import random
+from typing import Union, List, Dict, Tuple, Optional
+from urllib.parse import urlsplit
 
 import playwright
-from fake_useragent import UserAgent
 from playwright.async_api import async_playwright
 from gembox.debug_utils import Debugger
 
-from .exception import NoActivePageError
+from quokka_web._default_debugger import DEFAULT_DEBUGGER
+from .exception import NoActivePageError, BrowserNotRunningError
 
-ua = UserAgent()
+_UA_POOL_SIZE = 128
+"""the number of user agents sampled once, to pick the user agent of each new context from"""
+
+_ua_pool: Optional[Tuple[str, ...]] = None
+
+
+def _random_user_agent() -> str:
+    """
+    Pick a random user agent for a new context.
+
+    `fake_useragent` is only imported, and `UserAgent()` (which loads its data file) only built, when the first
+    context is opened. It is sampled once into a pool which later contexts pick from with a plain `random.choice`.
+
+    :return: (str) the user agent
+    """
+    global _ua_pool
+    if _ua_pool is None:
+        from fake_useragent import UserAgent
+        ua = UserAgent()
+        _ua_pool = tuple(ua.random for _ in range(_UA_POOL_SIZE))
+    return random.choice(_ua_pool)
+
+
+async def _unroute_all(context: playwright.async_api.BrowserContext):
+    """
+    Remove all routes of the context, whoever registered them.
+
+    :param context: (BrowserContext) the context
+    :return: (None)
+    """
+    if hasattr(context, "unroute_all"):  # playwright >= 1.41
+        await context.unroute_all()
+        return
+    # `unroute(url)` without a handler removes every handler of the url
+    for url in {handler.matcher.match for handler in context._impl_obj._routes}:
+        await context.unroute(url)
 
 
 class SingleBrowserManager:
@@ -22,7 +60,7 @@ class SingleBrowserManager:
         """
         self._wright = wright
         self._headless: bool = headless
-        self._debug_tool = debug_tool if debug_tool is not None else Debugger()
+        self._debug_tool = debug_tool if debug_tool is not None else DEFAULT_DEBUGGER
         self._is_running: bool = False
         self._browser: [playwright.async_api.Browser, None] = None
         self._context: [playwright.async_api.BrowserContext, None] = None
@@ -83,9 +121,14 @@ class SingleBrowserManager:
 
         if viewport is None:
             viewport = {'width': 1360, 'height': 900}
-        self._browser = await self.wright.chromium.launch(headless=self.headless, **kwargs)
-        self._context = await self._browser.new_context(viewport=viewport, user_agent=ua.random)  # randomize user agent
-        self._page = await self._context.new_page()
+        self._browser = await self._acquire_browser(**kwargs)
+        try:
+            self._context, self._page = await self._open_context(viewport=viewport)
+        except BaseException:
+            # give the browser back (or disconnect, or close it), otherwise a pool of one browser blocks every later start
+            await self._release_browser()
+            self._browser = None
+            raise
         self._is_running = True
         self.debug_tool.info(f"[Browser Manager]: Browser started successfully.")
 
@@ -94,13 +137,39 @@ class SingleBrowserManager:
         if self.is_running is False:
             self.debug_tool.warn(f"Browser is not running, no need to close_browser.")
             return
-        await self.browser.close()
+        await self._release_browser()
         self._browser = None
         self._context = None
         self._page = None
         self._is_running = False
         self.debug_tool.info(f"[Browser Manager]: Browser closed successfully.")
 
+    async def _acquire_browser(self, **kwargs) -> playwright.async_api.Browser:
+        """
+        Get the browser to open the context in, called by `start()`.
+
+        :param kwargs: (dict) the kwargs for `playwright.launch()`
+        :return: (Browser) a newly launched browser
+        """
+        return await self.wright.chromium.launch(headless=self.headless, **kwargs)
+
+    async def _open_context(self, viewport: dict):
+        """
+        Open the context and the page to work in, called by `start()` after `_acquire_browser()`.
+
+        :param viewport: (dict) the viewport
+        :return: (Tuple[BrowserContext, Page]) the context and its page
+        """
+        context = await self._browser.new_context(viewport=viewport, user_agent=_random_user_agent())  # randomize user agent
+        return context, await context.new_page()
+
+    async def _release_browser(self):
+        """
+        Release the browser (and the context in it, if it was opened), called by `close()`, and by `start()` when
+        opening the context fails.
+        """
+        await self.browser.close()
+
     async def restart(self):
         await self.close()
         await self.start()
@@ -140,3 +209,327 @@ class SingleBrowserManager:
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
+
+
+class BrowserPool:
+    """
+    A pool of launched browsers, so that agents can borrow a running browser instead of launching their own.
+
+    Each browser is lent to one manager at a time, the manager only opens (and closes) its own context in it.
+    """
+
+    def __init__(self,
+                 wright: playwright.async_api.Playwright,
+                 size: int = 1,
+                 headless: bool = True,
+                 debug_tool: Debugger = None,
+                 **launch_kwargs) -> None:
+        """
+        Initialize the BrowserPool.
+
+        **Note: Browsers are launched in `start()`, you can also use `async with` to start and close the pool**
+
+        :param wright: (Playwright) the playwright instance
+        :param size: (int) the number of browsers to launch
+        :param headless: (bool) whether the browsers are headless
+        :param debug_tool: (Debugger) the debugger
+        :param launch_kwargs: (dict) the kwargs for `playwright.launch()`
+        """
+        assert isinstance(size, int) and size > 0, f"size must be a positive integer, got {size}"
+        self._wright = wright
+        self._size = size
+        self._headless = headless
+        self._debug_tool = debug_tool if debug_tool is not None else DEFAULT_DEBUGGER
+        self._launch_kwargs = launch_kwargs
+        self._browsers: List[playwright.async_api.Browser] = []
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    @property
+    def size(self) -> int:
+        """the number of browsers in the pool"""
+        return self._size
+
+    @property
+    def debug_tool(self):
+        """the debugger"""
+        return self._debug_tool
+
+    @property
+    def is_running(self) -> bool:
+        """whether the browsers are launched"""
+        return len(self._browsers) > 0
+
+    async def start(self):
+        """
+        Launch all browsers of the pool.
+
+        :return: (None)
+        """
+        if self.is_running:
+            self.debug_tool.warn("[Browser Pool]: Browser pool is already running, no need to start.")
+            return
+        self.debug_tool.info(f"[Browser Pool]: Launching {self.size} browsers...")
+        self._browsers = list(await asyncio.gather(*[
+            self._wright.chromium.launch(headless=self._headless, **self._launch_kwargs) for _ in range(self.size)
+        ]))
+        for browser in self._browsers:
+            self._queue.put_nowait(browser)
+        self.debug_tool.info(f"[Browser Pool]: Launched {self.size} browsers successfully.")
+
+    async def acquire(self) -> playwright.async_api.Browser:
+        """
+        Borrow a browser from the pool, waiting until one is released if all are borrowed.
+
+        :return: (Browser) the browser
+        """
+        if not self.is_running:
+            raise BrowserNotRunningError("Browser pool is not running, please start it first")
+        return await self._queue.get()
+
+    def release(self, browser: playwright.async_api.Browser):
+        """
+        Give a borrowed browser back to the pool.
+
+        :param browser: (Browser) the browser acquired by `acquire()`
+        :return: (None)
+        """
+        self._queue.put_nowait(browser)
+
+    async def close(self):
+        """
+        Close all browsers of the pool.
+
+        :return: (None)
+        """
+        if not self.is_running:
+            self.debug_tool.warn("[Browser Pool]: Browser pool is not running, no need to close.")
+            return
+        self.debug_tool.info(f"[Browser Pool]: Closing {self.size} browsers...")
+        await asyncio.gather(*[browser.close() for browser in self._browsers])
+        self._browsers = []
+        self._queue = asyncio.Queue()
+        self.debug_tool.info("[Browser Pool]: Closed browsers successfully.")
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class ContextPool:
+    """
+    A pool of opened contexts (each with one page) in a browser, so that managers can reuse a context instead of
+    opening a new one on every start.
+
+    Contexts are pooled by viewport. A released context is reset before it is handed out again: its routes and
+    permissions are removed, its cookies and the storage of every origin it visited are cleared, and its page is
+    replaced by a new one. It is closed instead when `max_size` contexts of its viewport are already idle.
+    """
+
+    def __init__(self,
+                 browser: playwright.async_api.Browser,
+                 max_size: int = 4,
+                 debug_tool: Debugger = None) -> None:
+        """
+        Initialize the ContextPool.
+
+        :param browser: (Browser) the browser to open the contexts in, the pool does not close it
+        :param max_size: (int) the maximum number of idle contexts kept per viewport
+        :param debug_tool: (Debugger) the debugger
+        """
+        assert isinstance(max_size, int) and max_size > 0, f"max_size must be a positive integer, got {max_size}"
+        self._browser = browser
+        self._max_size = max_size
+        self._debug_tool = debug_tool if debug_tool is not None else DEFAULT_DEBUGGER
+        self._idle: Dict[tuple, asyncio.Queue] = {}
+
+    @property
+    def browser(self) -> playwright.async_api.Browser:
+        """the browser the contexts are opened in"""
+        return self._browser
+
+    @property
+    def max_size(self) -> int:
+        """the maximum number of idle contexts kept per viewport"""
+        return self._max_size
+
+    @property
+    def debug_tool(self):
+        """the debugger"""
+        return self._debug_tool
+
+    async def acquire(self, viewport: dict) -> Tuple[playwright.async_api.BrowserContext, playwright.async_api.Page]:
+        """
+        Get an idle context of the viewport, or open a new one if there is none.
+
+        :param viewport: (dict) the viewport
+        :return: (Tuple[BrowserContext, Page]) the context and its page
+        """
+        idle = self._idle.get(self._viewport_key(viewport))
+        if idle is not None and not idle.empty():
+            return idle.get_nowait()
+        context = await self._browser.new_context(viewport=viewport, user_agent=_random_user_agent())  # randomize user agent
+        # record the origins of the documents loaded in the context, their storage is cleared on release
+        origins = set()
+        setattr(context, "_quokka_origins", origins)
+        context.on("request", lambda request: self._record_origin(origins, request))
+        return context, await context.new_page()
+
+    async def release(self, context: playwright.async_api.BrowserContext, page: playwright.async_api.Page):
+        """
+        Reset a context acquired by `acquire()` and give it back to the pool, or close it if the pool is full.
+
+        :param context: (BrowserContext) the context
+        :param page: (Page) the page of the context
+        :return: (None)
+        """
+        idle = self._idle.setdefault(self._viewport_key(page.viewport_size), asyncio.Queue())
+        if idle.qsize() >= self._max_size or page.is_closed():
+            await context.close()
+            return
+        try:
+            page = await self._reset(context, page)
+        except playwright.async_api.Error as e:
+            self.debug_tool.warn(f"[Context Pool]: Failed to reset a context, closing it. Error: {e}")
+            await context.close()
+            return
+        idle.put_nowait((context, page))
+
+    async def _reset(self, context: playwright.async_api.BrowserContext, page: playwright.async_api.Page):
+        """
+        Reset a context, so that nothing of the previous user is seen by the next one.
+
+        The page is replaced by a new one, which also drops its session storage, routes, listeners and init scripts.
+
+        :param context: (BrowserContext) the context
+        :param page: (Page) the page of the context
+        :return: (Page) the new page of the context
+        """
+        await _unroute_all(context)
+        await context.clear_permissions()
+        await context.clear_cookies()
+        origins = getattr(context, "_quokka_origins", set())
+        if origins:
+            session = await context.new_cdp_session(page)
+            try:
+                for origin in origins:
+                    await session.send("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+            finally:
+                await session.detach()
+            origins.clear()
+        new_page = await context.new_page()
+        await page.close()
+        return new_page
+
+    @staticmethod
+    def _record_origin(origins: set, request: playwright.async_api.Request):
+        if request.resource_type != "document":
+            return
+        url = urlsplit(request.url)
+        if url.scheme in ("http", "https"):
+            origins.add(f"{url.scheme}://{url.netloc}")
+
+    async def close(self):
+        """
+        Close all idle contexts of the pool.
+
+        :return: (None)
+        """
+        for idle in self._idle.values():
+            while not idle.empty():
+                context, _ = idle.get_nowait()
+                await context.close()
+        self._idle = {}
+
+    @staticmethod
+    def _viewport_key(viewport: Optional[dict]) -> tuple:
+        return (viewport or {}).get('width'), (viewport or {}).get('height')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class SharedBrowserManager(SingleBrowserManager):
+    """
+    A browser manager working on a browser it does not own: a running Chromium reached through a CDP endpoint, a
+    browser borrowed from a `BrowserPool`, a browser launched (and shared between managers) by the caller, or the
+    browser of a `ContextPool`, whose contexts are reused across starts.
+
+    It only opens its own context and page in `start()`, and only closes those in `close()`, the browser keeps running.
+    """
+
+    def __init__(self,
+                 wright: playwright.async_api.Playwright,
+                 headless=True,
+                 debug_tool: Debugger = None,
+                 cdp_endpoint: str = None,
+                 browser_pool: BrowserPool = None,
+                 browser: playwright.async_api.Browser = None,
+                 context_pool: ContextPool = None) -> None:
+        """
+        Initialize the SharedBrowserManager.
+
+        :param wright: (Playwright) the playwright instance
+        :param headless: (bool) whether the browser is headless, only used by `SingleBrowserManager`
+        :param debug_tool: (Debugger) the debugger
+        :param cdp_endpoint: (str) the CDP endpoint of a running Chromium, e.g. `http://localhost:9222`
+        :param browser_pool: (BrowserPool) the pool to borrow the browser from
+        :param browser: (Browser) a launched browser, several managers can open their contexts in it at the same time
+        :param context_pool: (ContextPool) the pool to take the context from, and to give it back to on close
+        """
+        assert [cdp_endpoint, browser_pool, browser, context_pool].count(None) == 3, \
+            "exactly one of cdp_endpoint, browser_pool, browser and context_pool must be given"
+        super().__init__(wright=wright, headless=headless, debug_tool=debug_tool)
+        self._cdp_endpoint = cdp_endpoint
+        self._browser_pool = browser_pool
+        self._shared_browser = browser if context_pool is None else context_pool.browser
+        self._context_pool = context_pool
+
+    async def _acquire_browser(self, **kwargs) -> playwright.async_api.Browser:
+        """
+        Connect to the CDP endpoint, borrow a browser from the pool, or use the given browser.
+
+        :param kwargs: (dict) the kwargs for `playwright.connect_over_cdp()`, ignored otherwise
+        :return: (Browser) the shared browser
+        """
+        if self._shared_browser is not None:
+            return self._shared_browser
+        if self._cdp_endpoint is not None:
+            return await self.wright.chromium.connect_over_cdp(self._cdp_endpoint, **kwargs)
+        return await self._browser_pool.acquire()
+
+    async def _open_context(self, viewport: dict):
+        """
+        Take a context from the context pool if there is one, otherwise open a new one.
+
+        :param viewport: (dict) the viewport
+        :return: (Tuple[BrowserContext, Page]) the context and its page
+        """
+        if self._context_pool is not None:
+            return await self._context_pool.acquire(viewport=viewport)
+        return await super()._open_context(viewport=viewport)
+
+    async def _release_browser(self):
+        """
+        Close the context (or give it back to the context pool), then disconnect from the CDP endpoint or give the
+        browser back to the pool. A browser given by the caller is left as is, the caller closes it.
+        """
+        if self._context_pool is not None:
+            if self.context is not None:
+                await self._context_pool.release(self.context, self.page)
+            return
+        try:
+            if self.context is not None:
+                await self.context.close()
+        finally:
+            if self._shared_browser is None:
+                if self._cdp_endpoint is not None:
+                    # on a connected browser, `close()` only disconnects, the remote browser keeps running
+                    await self.browser.close()
+                else:
+                    self._browser_pool.release(self.browser)
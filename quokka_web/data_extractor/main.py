@@ -12,16 +12,37 @@ class DataExtractor:
         self._debug_tool = debug_tool
 
     async def get_attr(self, selector: str, attr: str, strict: bool = False) -> str:
-        element = await self._page.query_selector(selector=selector, strict=strict)
-        return await get_elem_attr(elem=element, attr=attr)
+        """
+        Get the attribute of the element matching the selector, in a single round-trip.
 
-    async def get_attrs(self, selector, attr: str) -> List[str]:
-        elements = await self._page.query_selector_all(selector=selector)
-        return [await element.get_attribute(attr) for element in elements]
+        :param selector: (str) the selector
+        :param attr: (str) the attribute name
+        :param strict: (bool) if True, raise Error when the selector resolves to multiple elements
+        :return: (str) the attribute value
+        """
+        return await self._page.eval_on_selector(selector, "(el, a) => el.getAttribute(a)", attr, strict=strict)
 
-    async def get_class_list(self, selector, strict: bool = False):
-        element = await self._page.query_selector(selector=selector, strict=strict)
-        return await get_elem_class_list(elem=element)
+    async def get_attrs(self, selector, attr: str) -> List[str]:
+        """
+        Get the attribute of all elements matching the selector, in a single round-trip.
+
+        :param selector: (str) the selector
+        :param attr: (str) the attribute name
+        :return: (List[str]) the attribute values, `None` for elements without the attribute
+        """
+        if not selector:
+            return []
+        return await self._page.eval_on_selector_all(selector, "(els, a) => els.map(e => e.getAttribute(a))", attr)
+
+    async def get_class_list(self, selector, strict: bool = False) -> List[str]:
+        """
+        Get the class list of the element matching the selector, in a single round-trip.
+
+        :param selector: (str) the selector
+        :param strict: (bool) if True, raise Error when the selector resolves to multiple elements
+        :return: (List[str]) the class list
+        """
+        return await self._page.eval_on_selector(selector, "el => (el.getAttribute('class') || '').split(' ')", strict=strict)
 
     @property
     def page(self) -> playwright.async_api.Page:
@@ -1,4 +1,6 @@
-from typing import List
+import asyncio
+import functools
+from typing import List, Tuple
 import playwright.async_api
 
 
@@ -6,6 +8,23 @@ async def get_elem_attr(elem: playwright.async_api.ElementHandle, attr: str) ->
     return await elem.get_attribute(attr)
 
 
+async def get_elems_attr(elems: List[playwright.async_api.ElementHandle], attr: str) -> List[str]:
+    """
+    Get the attribute of each element, with all the requests in flight concurrently.
+
+    :param elems: (List[ElementHandle]) the elements, e.g. from `query_selector_all`
+    :param attr: (str) the attribute name
+    :return: (List[str]) the attribute values, in the same order as `elems`
+    """
+    return list(await asyncio.gather(*(elem.get_attribute(attr) for elem in elems)))
+
+
 async def get_elem_class_list(elem: playwright.async_api.ElementHandle) -> List[str]:
     cls_str = await get_elem_attr(elem, "class")
-    return cls_str.split(" ")
+    return list(_split_classes(cls_str or ""))
+
+
+@functools.lru_cache(maxsize=1024)
+def _split_classes(cls_str: str) -> Tuple[str, ...]:
+    """class strings repeat a lot across similar elements (table rows, grid items), so the split is memoized"""
+    return tuple(cls_str.split(" "))
@@ -1,19 +1,103 @@
 import pathlib
 import aiofiles
-from typing import Union, List, Callable, Optional
+from typing import Union, List, Callable, Optional, Dict
 
 import playwright.async_api
 from gembox.debug_utils import Debugger
 from gembox.io import ensure_pathlib_path, check_and_make_dir
 
+from quokka_web._default_debugger import DEFAULT_DEBUGGER
 from quokka_web.page_interactor.modules import CommonHandler, ScrollHandler, ClickHandler
+from quokka_web.page_interactor.modules.handler import install_script
+
+_DOWNLOAD_CHUNK_SIZE = 1 << 20
+"""the number of UTF-16 code units fetched per round-trip when downloading the whole webpage"""
+
+# serialize the document the same way as `page.content()` does, and keep it in the page for chunked reading
+_STASH_CONTENT_JS = """() => {
+    let content = '';
+    if (document.doctype) content = new XMLSerializer().serializeToString(document.doctype);
+    if (document.documentElement) content += document.documentElement.outerHTML;
+    window.__quokka_content = content;
+    return content.length;
+}"""
+
+# read one chunk of the stashed content, never splitting a surrogate pair across two chunks
+_READ_CONTENT_CHUNK_JS = """({off, len}) => {
+    const content = window.__quokka_content;
+    let end = Math.min(off + len, content.length);
+    const code = content.charCodeAt(end - 1);
+    if (end < content.length && code >= 0xD800 && code <= 0xDBFF) end -= 1;
+    return {chunk: content.slice(off, end), end: end};
+}"""
+
+_DROP_CONTENT_JS = "() => { delete window.__quokka_content; }"
+
+CHAIN_OPS = ('click', 'type', 'scrollBy', 'count')
+"""the operations supported by `PageInteractor.chain`"""
+
+# run a list of actions inside the page, then observe the page state, all in one round-trip.
+# installed once per page, so each chain only sends its actions
+_QUOKKA_CHAIN_JS = """(() => {
+    window.__quokka_chain = actions => {
+        const results = [];
+        for (const a of actions) {
+            if (a.op === 'count') {
+                results.push(document.querySelectorAll(a.selector).length);
+                continue;
+            }
+            const el = a.elem || (a.selector ? document.querySelector(a.selector) : null);
+            if (a.selector && !el) throw new Error(`No element matches the selector: ${a.selector}`);
+            if (a.op === 'click') {
+                el.click();
+            } else if (a.op === 'type') {
+                el.focus();
+                el.value += a.args[0];
+                el.dispatchEvent(new Event('input', {bubbles: true}));
+                el.dispatchEvent(new Event('change', {bubbles: true}));
+            } else if (a.op === 'scrollBy') {
+                if (el) { el.scrollLeft += a.args[0]; el.scrollTop += a.args[1]; } else { window.scrollBy(a.args[0], a.args[1]); }
+            }
+            results.push(null);
+        }
+        const s = document.scrollingElement || document.documentElement;
+        const focus = document.activeElement;
+        return {
+            results: results,
+            observation: {
+                url: location.href,
+                title: document.title,
+                viewport: {width: window.innerWidth, height: window.innerHeight},
+                focus: focus ? focus.tagName.toLowerCase() : null,
+                scrollTop: s.scrollTop,
+                scrollHeight: s.scrollHeight,
+            },
+        };
+    };
+})();"""
+
+_CHAIN_RUNNER_JS = "actions => window.__quokka_chain(actions)"
 
 
 class PageInteractor:
-    def __init__(self, page, debug_tool: Optional[Debugger] = None):
+    def __init__(self,
+                 page,
+                 debug_tool: Optional[Debugger] = None,
+                 cache_selectors: bool = False,
+                 selectors: Optional[Dict[str, str]] = None):
+        """
+        Initialize the PageInteractor.
+
+        :param page: (playwright.async_api.Page) the page
+        :param debug_tool: (Debugger, optional) the debugger
+        :param cache_selectors: (bool) whether `get_element(s)` reuse resolved elements until the page navigates,
+            see `clear_selector_cache`
+        :param selectors: (Dict[str, str], optional) named selectors, used by `get_elements_by_name`
+        """
         self._page: playwright.async_api.Page = page
-        self._debug_tool = Debugger() if debug_tool is None else debug_tool
-        self._common_handler = CommonHandler(page=self.page, debug_tool=self.debug_tool)
+        self._debug_tool = DEFAULT_DEBUGGER if debug_tool is None else debug_tool
+        self._common_handler = CommonHandler(page=self.page, debug_tool=self.debug_tool, cache_selectors=cache_selectors,
+                                             selectors=selectors)
         self._scroll_handler = ScrollHandler(page=self.page, debug_tool=self.debug_tool)
         self._click_handler = ClickHandler(page=self.page, debug_tool=self.debug_tool)
 
@@ -35,6 +119,23 @@ class PageInteractor:
         """
         return await self._common_handler.get_elements(selector=selector)
 
+    async def get_elements_by_name(self, name: str) -> List[playwright.async_api.ElementHandle]:
+        """
+        Get the elements of a named selector.
+
+        :param name: (str) the name of the selector, a key of the `selectors` given at initialization
+        :return: (List[playwright.async_api.ElementHandle]) the elements
+        """
+        return await self._common_handler.get_elements_by_name(name=name)
+
+    def clear_selector_cache(self):
+        """
+        Drop the elements cached with `cache_selectors`, call it when the DOM changed without a navigation.
+
+        :return: (None)
+        """
+        self._common_handler.clear_selector_cache()
+
     async def count(self, selector: str) -> int:
         """
         Count the number of elements according to the selector.
@@ -77,7 +178,8 @@ class PageInteractor:
                           load_wait: int = 40,
                           same_th: int = 20,
                           scroll_step_callbacks: Optional[List[Callable]] = None,
-                          elem: Optional[playwright.async_api.ElementHandle] = None) -> None:
+                          elem: Optional[playwright.async_api.ElementHandle] = None,
+                          wait_strategy: str = "sleep") -> None:
         """
         Scroll and load all contents, until scrolling top does not change.
 
@@ -86,10 +188,12 @@ class PageInteractor:
         :param same_th: (int) The threshold of the number of same scroll top to stop scrolling.
         :param scroll_step_callbacks: (List[Callable]) A callback function to be called after each scroll.
         :param elem: (playwright.async_api.ElementHandler) The element to scroll. If None, scroll the whole page.
+        :param wait_strategy: (str) How to wait after each scroll, "sleep" waits `load_wait` ms, "networkidle" waits until no request is in flight, at most `load_wait` ms.
         :return:
         """
         return await self._scroll_handler.scroll_load(scroll_step=scroll_step, load_wait=load_wait, same_th=same_th,
-                                                      scroll_step_callbacks=scroll_step_callbacks, elem=elem)
+                                                      scroll_step_callbacks=scroll_step_callbacks, elem=elem,
+                                                      wait_strategy=wait_strategy)
 
     async def scroll_load_selector(self,
                                    selector: str,
@@ -100,7 +204,8 @@ class PageInteractor:
                                    scroll_step_callbacks: List[Callable] = None,
                                    log_interval: int = 100,
                                    count_check_interval: int = 5,
-                                   elem: Optional[playwright.async_api.ElementHandle] = None) -> List[playwright.async_api.ElementHandle]:
+                                   elem: Optional[playwright.async_api.ElementHandle] = None,
+                                   wait_strategy: str = "sleep") -> List[playwright.async_api.ElementHandle]:
         """
         Scroll and load all contents, until no new content is loaded or enough specific items are collected.
 
@@ -113,6 +218,7 @@ class PageInteractor:
         :param log_interval: (int) The interval of logging the number of loaded elements.
         :param count_check_interval: (int) The interval of checking the number of loaded elements.
         :param elem: (ElementHandle) The element to scroll. If None, scroll the whole page.
+        :param wait_strategy: (str) How to wait after each scroll, "sleep" waits `load_wait` ms, "networkidle" waits until no request is in flight, at most `load_wait` ms.
 
         :return: (int) The number of elements matching the selector
         """
@@ -121,7 +227,39 @@ class PageInteractor:
                                                                same_th=same_th,
                                                                scroll_step_callbacks=scroll_step_callbacks,
                                                                log_interval=log_interval,
-                                                               count_check_interval=count_check_interval, elem=elem)
+                                                               count_check_interval=count_check_interval, elem=elem,
+                                                               wait_strategy=wait_strategy)
+
+    async def scroll_load_selector_attrs(self,
+                                         selector: str,
+                                         attr: str,
+                                         threshold: Optional[int] = None,
+                                         scroll_step: int = 400,
+                                         load_wait: int = 40,
+                                         same_th: int = 20,
+                                         scroll_step_callbacks: List[Callable] = None,
+                                         log_interval: int = 100,
+                                         count_check_interval: int = 5,
+                                         elem: Optional[playwright.async_api.ElementHandle] = None,
+                                         wait_strategy: str = "sleep") -> List[str]:
+        """
+        Same as `scroll_load_selector`, but extract `attr` of the loaded elements inside the page.
+
+        :param selector: (str) The selector of the elements to load
+        :param attr: (str) The attribute to extract from each loaded element
+
+        Other parameters are the same as `scroll_load_selector`.
+
+        :return: (List[str]) The attribute values of the elements matching the selector
+        """
+        return await self._scroll_handler.scroll_load_selector_attrs(selector=selector, attr=attr, threshold=threshold,
+                                                                     scroll_step=scroll_step, load_wait=load_wait,
+                                                                     same_th=same_th,
+                                                                     scroll_step_callbacks=scroll_step_callbacks,
+                                                                     log_interval=log_interval,
+                                                                     count_check_interval=count_check_interval,
+                                                                     elem=elem,
+                                                                     wait_strategy=wait_strategy)
 
     async def get_scroll_top(self, elem: playwright.async_api.ElementHandle = None) -> int:
         return await self._scroll_handler.get_scroll_top(elem=elem)
@@ -129,6 +267,45 @@ class PageInteractor:
     async def get_scroll_height(self, elem: playwright.async_api.ElementHandle = None) -> int:
         return await self._scroll_handler.get_scroll_height(elem=elem)
 
+    async def get_scroll_state(self, selector: str = None, elem: playwright.async_api.ElementHandle = None) -> dict:
+        """
+        Get the scroll top, the scroll height and the number of elements matching `selector` in a single round-trip.
+
+        :param selector: (str) the selector to count, if None, the count is skipped and `n` is -1
+        :param elem: (ElementHandle) the element, if None, the whole page
+        :return: (dict) `{'top': scroll top, 'h': scroll height, 'n': number of elements matching selector}`
+        """
+        return await self._scroll_handler.get_scroll_state(selector=selector, elem=elem)
+
+    # Chain operation
+    async def chain(self, actions: List[dict]) -> dict:
+        """
+        Run a sequence of actions inside the page in a single round-trip, then observe the page.
+
+        Each action is a dict `{'op': op, 'selector': str, 'elem': ElementHandle, 'args': list}`, where `op` is one of
+
+        - `'click'`: call `click()` on the element
+        - `'type'`: append `args[0]` to the element's value, then fire `input` and `change` events
+        - `'scrollBy'`: scroll the element (or the page, without selector and elem) by `args[0]`, `args[1]` pixels
+        - `'count'`: count the elements matching the selector
+
+        **Note: the actions are DOM-level, e.g. `click` dispatches a click event without moving the mouse, and
+        there is no auto-waiting for the elements as with playwright's actions.**
+
+        :param actions: (List[dict]) the actions
+        :return: (dict) `{'results': [result of each action], 'observation': {url, title, viewport, focus, scrollTop, scrollHeight}}`
+        """
+        for action in actions:
+            if action.get('op') not in CHAIN_OPS:
+                raise ValueError(f"Unknown chain op: {action.get('op')}, it should be one of {CHAIN_OPS}")
+        payload = [{'op': action['op'],
+                    'selector': action.get('selector'),
+                    'elem': action.get('elem'),
+                    'args': action.get('args', [])} for action in actions]
+        self.debug_tool.debug(f"Running a chain of {len(payload)} actions...")
+        await install_script(page=self._page, name="quokka_chain", script=_QUOKKA_CHAIN_JS)
+        return await self._page.evaluate(_CHAIN_RUNNER_JS, payload)
+
     # Other operation
     async def type_input(self, selector: str, text: str):
         return await self.page.type(selector=selector, text=text)
@@ -150,15 +327,67 @@ class PageInteractor:
 
         elem_str = f"element {elem}" if elem is not None else "whole webpage"
         self.debug_tool.info(f"Downloading the {elem_str}, page url: {self.page.url}...")
-        if elem is None:
-            content = await self._page.content()
-        else:
-            content = await elem.inner_html()
-        self.debug_tool.info(f"Pumping the content to {file_path}...")
-        async with aiofiles.open(file_path, mode="w", encoding=encoding) as f:
-            await f.write(content)
+        async with aiofiles.open(file_path, mode="wb") as f:
+            if elem is None:
+                await self._write_content_chunked(f, encoding=encoding)
+            else:
+                content = (await elem.inner_html()).encode(encoding)
+                await f.write(content)
+                del content
         self.debug_tool.info(f"Downloaded the {elem_str} successfully, page url: {self.page.url}, file_path: {file_path}")
 
+    async def download_mhtml(self, file_path: Union[str, pathlib.Path]):
+        """
+        Download the current web page as an MHTML snapshot, including its resources (images, stylesheets, etc.).
+
+        The snapshot is captured by the browser through CDP `Page.captureSnapshot` in a single round-trip, without
+        serializing the DOM in the page's JavaScript engine. **Note: only available on Chromium.**
+
+        :param file_path: (str, pathlib.Path) the file path
+        :return: (None)
+        """
+        file_path = ensure_pathlib_path(file_path)
+        check_and_make_dir(file_path.parent)
+
+        self.debug_tool.info(f"Downloading the MHTML snapshot, page url: {self.page.url}...")
+        cdp = await self.page.context.new_cdp_session(self.page)
+        try:
+            snapshot = await cdp.send("Page.captureSnapshot", {"format": "mhtml"})
+        finally:
+            await cdp.detach()
+        async with aiofiles.open(file_path, mode="wb") as f:
+            await f.write(snapshot["data"].encode("utf-8"))
+        self.debug_tool.info(f"Downloaded the MHTML snapshot successfully, page url: {self.page.url}, file_path: {file_path}")
+
+    async def _write_content_chunked(self, f, encoding: str = "utf-8", chunk_size: int = _DOWNLOAD_CHUNK_SIZE):
+        """
+        Write the whole webpage content to an opened file, fetching it from the page in chunks of `chunk_size`.
+
+        Only one chunk is held in memory at a time, which keeps the peak memory low for very large webpages.
+
+        :param f: the aiofiles file object, opened in binary mode
+        :param encoding: (str) the encoding of the file
+        :param chunk_size: (int) the number of UTF-16 code units fetched per round-trip
+        :return: (None)
+        """
+        length = await self._page.evaluate(_STASH_CONTENT_JS)
+        try:
+            offset = 0
+            while offset < length:
+                result = await self._page.evaluate(_READ_CONTENT_CHUNK_JS, {"off": offset, "len": chunk_size})
+                await f.write(result["chunk"].encode(encoding))
+                offset = result["end"]
+        finally:
+            await self._page.evaluate(_DROP_CONTENT_JS)
+
+    def detach(self):
+        """
+        Remove the listeners the interactor registered on the page, call it before the page is closed or reused.
+
+        :return: (None)
+        """
+        self._common_handler.detach()
+
     async def go_back(self, **kwargs):
         """
         Go back to the previous page.
@@ -1,5 +1,50 @@
+import playwright.async_api
+
 from quokka_web.page_interactor.modules.handler import Handler
 
+# installed once per page, so each probe only sends the selectors
+_QUOKKA_CLICK_JS = """window.__quokka_click = (() => {
+    // the same test as Playwright's `isElementVisible`, which `page.is_visible` uses
+    const isVisibleText = node => {
+        const range = document.createRange();
+        range.selectNodeContents(node);
+        return Array.from(range.getClientRects()).some(r => r.width > 0 && r.height > 0);
+    };
+    const isVisible = el => {
+        const style = window.getComputedStyle(el);
+        if (style.display === 'contents') {
+            for (let child = el.firstChild; child; child = child.nextSibling) {
+                if (child.nodeType === Node.ELEMENT_NODE && isVisible(child)) return true;
+                if (child.nodeType === Node.TEXT_NODE && isVisibleText(child)) return true;
+            }
+            return false;
+        }
+        if (style.visibility !== 'visible') return false;
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0;
+    };
+    // null when the caller has to ask Playwright instead: for the selectors only understood by Playwright (`text=`,
+    // `>>`, `:has-text()`...), which are not valid CSS, and when nothing matches, as the element may be in a shadow root
+    const visibility = sel => {
+        let el;
+        try { el = document.querySelector(sel); } catch (e) { return null; }
+        return el === null ? null : isVisible(el);
+    };
+    return {
+        isVisible: sel => visibility(sel) === true,
+        // probe both the target and the clicking element in one round-trip
+        probe: (visibleSel, clickSel) => ({
+            visible: visibility(visibleSel),
+            clickable: visibility(clickSel),
+        }),
+    };
+})();"""
+
+# polled inside the browser, so waiting for visibility costs a single round-trip
+_IS_VISIBLE_JS = "sel => window.__quokka_click.isVisible(sel)"
+
+_PROBE_JS = "([visibleSel, clickSel]) => window.__quokka_click.probe(visibleSel, clickSel)"
+
 
 class ClickHandler(Handler):
     async def click_until_element_visible(self, click_selector: str, visible_selector: str, max_retry: int = 5):
@@ -12,26 +57,63 @@ class ClickHandler(Handler):
         :return: (None)
         """
         self.debug_tool.debug(f"Clicking {click_selector} until {visible_selector} becomes visible, max_retry: {max_retry}...")
+        # the click target is usually stable across retries (e.g. a "Load more" button), so query it only once
+        element_to_click = None
+        await self._install_script(name="quokka_click", script=_QUOKKA_CLICK_JS)
         n_retry = 0
-        while not await self.page.is_visible(visible_selector) and n_retry < max_retry:
-            if await self.page.is_visible(click_selector):
-                element_to_click = await self.page.query_selector(click_selector)
-                await element_to_click.scroll_into_view_if_needed()
-                await element_to_click.click()
-                try:
-                    await self.page.wait_for_selector(visible_selector, state='visible', timeout=5000)
-                except Exception:
-                    pass
-            else:
+        while n_retry < max_retry:
+            probe = await self.page.evaluate(_PROBE_JS, [visible_selector, click_selector])
+            visible, clickable = probe['visible'], probe['clickable']
+            # the probe cannot find non-CSS selectors or elements in shadow roots, ask Playwright for those
+            if visible is None:
+                visible = await self.page.is_visible(visible_selector)
+            if clickable is None:
+                clickable = await self.page.is_visible(click_selector)
+            # the in-page wait can only poll an element the probe found
+            probe_finds_visible = probe['visible'] is not None
+            if visible:
+                self.debug_tool.debug(f"Make {visible_selector} visible after {n_retry} / {max_retry} tries.")
+                return
+            if not clickable:
                 self.debug_tool.error(f"Cannot find the clicking element: {click_selector}")
                 raise RuntimeError(f"Cannot find the clicking element: {click_selector}")
+
+            if element_to_click is None:
+                element_to_click = await self._query_visible_element(click_selector)
+            try:
+                await element_to_click.scroll_into_view_if_needed()
+                await element_to_click.click()
+            except playwright.async_api.Error:
+                # the cached handle went stale (detached), re-query it once
+                element_to_click = await self._query_visible_element(click_selector)
+                await element_to_click.scroll_into_view_if_needed()
+                await element_to_click.click()
             n_retry += 1
+            try:
+                if probe_finds_visible:
+                    await self.page.wait_for_function(_IS_VISIBLE_JS, arg=visible_selector, timeout=5000)
+                else:
+                    await self.page.wait_for_selector(visible_selector, state='visible', timeout=5000)
+                self.debug_tool.debug(f"Make {visible_selector} visible after {n_retry} / {max_retry} tries.")
+                return
+            except playwright.async_api.TimeoutError:
+                pass
 
-        if n_retry >= max_retry:
-            self.debug_tool.error(f"Cannot make {visible_selector} visible after {max_retry} tries.")
-            raise RuntimeError(f"Cannot make {visible_selector} visible after {max_retry} tries.")
-        else:
-            self.debug_tool.debug(f"Make {visible_selector} visible after {n_retry} / {max_retry} tries.")
+        self.debug_tool.error(f"Cannot make {visible_selector} visible after {max_retry} tries.")
+        raise RuntimeError(f"Cannot make {visible_selector} visible after {max_retry} tries.")
+
+    async def _query_visible_element(self, selector: str) -> playwright.async_api.ElementHandle:
+        """
+        Query the element and make sure it is visible.
+
+        :param selector: (str) the selector
+        :return: (ElementHandle) the element
+        """
+        element = await self.page.query_selector(selector)
+        if element is None or not await element.is_visible():
+            self.debug_tool.error(f"Cannot find the clicking element: {selector}")
+            raise RuntimeError(f"Cannot find the clicking element: {selector}")
+        return element
 
 
 __all__ = ['ClickHandler']
@@ -1,17 +1,53 @@
-from typing import List
+from collections import OrderedDict
+from typing import List, Dict, Optional
 
 import playwright.async_api
+from gembox.debug_utils import Debugger
 
 from .handler import Handler
 
+_LOCATOR_CACHE_SIZE = 256
+"""the maximum number of locators kept per handler, the least recently used one is dropped beyond it"""
 
 class CommonHandler(Handler):
+    def __init__(self,
+                 page: playwright.async_api.Page,
+                 debug_tool: Debugger,
+                 cache_selectors: bool = False,
+                 selectors: Optional[Dict[str, str]] = None):
+        """
+        Initialize the CommonHandler.
+
+        :param page: (playwright.async_api.Page) the page
+        :param debug_tool: (Debugger) the debug tool
+        :param cache_selectors: (bool) whether to cache the resolved elements per selector until the page navigates
+        :param selectors: (Dict[str, str], optional) named selectors, whose locators are built up front
+        """
+        super(CommonHandler, self).__init__(page=page, debug_tool=debug_tool)
+        self._cache_selectors = cache_selectors
+        # cleared by the `framenavigated` listener, so a hit costs no round-trip
+        self._selector_cache: dict = {}
+        # locators are bound to the page, not to a document, so they stay valid across navigations
+        self._locators: "OrderedDict[str, playwright.async_api.Locator]" = OrderedDict()
+        self._named_selectors: Dict[str, str] = dict(selectors or {})
+        # the locators of the named selectors are pinned, out of reach of the LRU eviction of `_locators`
+        self._pinned_locators: Dict[str, playwright.async_api.Locator] = {
+            selector: page.locator(selector) for selector in self._named_selectors.values()
+        }
+        if cache_selectors:
+            page.on("framenavigated", self._on_frame_navigated)
+
     async def get_element(self, selector: str, strict: bool = False) -> playwright.async_api.ElementHandle:
         """
         Get the element according to the selector.
 
         If `strict` is True, then when resolving multiple elements, the function will raise Error
         """
+        if not self._cache_selectors:
+            return await self._get_element(selector=selector, strict=strict)
+        return await self._cached(("one", selector, strict), lambda: self._get_element(selector=selector, strict=strict))
+
+    async def _get_element(self, selector: str, strict: bool = False) -> playwright.async_api.ElementHandle:
         return await self.page.query_selector(selector=selector, strict=strict)
 
     async def get_elements(self, selector: str) -> List[playwright.async_api.ElementHandle]:
@@ -21,7 +57,20 @@ class CommonHandler(Handler):
         :param selector: (str) the selector
         :return: (List[playwright.async_api.ElementHandle]) the elements
         """
-        return await self.page.query_selector_all(selector=selector)
+        if not self._cache_selectors:
+            return await self._locator(selector).element_handles()
+        return list(await self._cached(("all", selector), lambda: self._locator(selector).element_handles()))
+
+    async def get_elements_by_name(self, name: str) -> List[playwright.async_api.ElementHandle]:
+        """
+        Get the elements of a named selector, through its locator built when the handler was created.
+
+        :param name: (str) the name of the selector
+        :return: (List[playwright.async_api.ElementHandle]) the elements
+        """
+        if name not in self._named_selectors:
+            raise KeyError(f"Unknown selector name: {name}, it should be one of {list(self._named_selectors)}")
+        return await self.get_elements(selector=self._named_selectors[name])
 
     async def count(self, selector: str) -> int:
         """
@@ -30,4 +79,62 @@ class CommonHandler(Handler):
         :param selector: (str) the selector
         :return: (int) the number of elements
         """
-        return len(await self.get_elements(selector=selector))
+        # counted inside the page, instead of sending every element handle over to take the length of the list
+        return await self._locator(selector).count()
+
+    def _locator(self, selector: str) -> playwright.async_api.Locator:
+        """
+        Get the locator of the selector, created once per selector and reused while it is among the
+        `_LOCATOR_CACHE_SIZE` most recently used ones, or for as long as the handler lives for the named selectors.
+
+        :param selector: (str) the selector
+        :return: (Locator) the locator
+        """
+        locator = self._pinned_locators.get(selector)
+        if locator is not None:
+            return locator
+        locator = self._locators.get(selector)
+        if locator is not None:
+            self._locators.move_to_end(selector)
+            return locator
+        locator = self._locators[selector] = self.page.locator(selector)
+        if len(self._locators) > _LOCATOR_CACHE_SIZE:
+            self._locators.popitem(last=False)
+        return locator
+
+    def clear_selector_cache(self):
+        """
+        Drop the cached elements, call it when the DOM changed without a navigation (e.g. after loading more items).
+
+        :return: (None)
+        """
+        self._selector_cache.clear()
+
+    async def _cached(self, key: tuple, resolve):
+        """
+        Get the cached result of `key` for the current document, or resolve and cache it.
+
+        **Note: the cached handles are handed to every caller, do not dispose them**
+
+        :param key: (tuple) the cache key
+        :param resolve: (Callable) the coroutine function resolving the result on a cache miss
+        :return: the result
+        """
+        if key not in self._selector_cache:
+            self._selector_cache[key] = await resolve()
+        return self._selector_cache[key]
+
+    def detach(self):
+        """
+        Stop listening to the page and drop the cached elements, call it when the page is released.
+
+        :return: (None)
+        """
+        if self._cache_selectors:
+            self.page.remove_listener("framenavigated", self._on_frame_navigated)
+        self._selector_cache.clear()
+
+    def _on_frame_navigated(self, frame: playwright.async_api.Frame):
+        # drop the handles of the previous document as soon as the main frame navigates
+        if frame == self.page.main_frame:
+            self._selector_cache.clear()
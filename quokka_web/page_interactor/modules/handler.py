@@ -3,6 +3,30 @@ import playwright.async_api
 from gembox.debug_utils import Debugger
 
 
+async def install_script(page: playwright.async_api.Page, name: str, script: str):
+    """
+    Install a helper script into the page once.
+
+    The script is registered as an init script, so it is re-run on every navigation, and also evaluated on the
+    current document. The installed names are recorded on the page, so everything sharing a page installs it only once.
+    Calls then only send the name of a helper over the wire, instead of the whole function source.
+
+    :param page: (playwright.async_api.Page) the page
+    :param name: (str) the name of the script, used to avoid installing it twice
+    :param script: (str) the JavaScript source
+    :return: (None)
+    """
+    installed = getattr(page, "_quokka_installed_scripts", None)
+    if installed is None:
+        installed = set()
+        setattr(page, "_quokka_installed_scripts", installed)
+    if name in installed:
+        return
+    await page.add_init_script(script=script)
+    await page.evaluate(script)
+    installed.add(name)
+
+
 class Handler(abc.ABC):
     def __init__(self, page: playwright.async_api.Page, debug_tool: Debugger):
         """
@@ -14,6 +38,16 @@ class Handler(abc.ABC):
         self._page = page
         self._debug_tool = debug_tool
 
+    async def _install_script(self, name: str, script: str):
+        """
+        Install a helper script into the page once, see `install_script`.
+
+        :param name: (str) the name of the script, used to avoid installing it twice
+        :param script: (str) the JavaScript source
+        :return: (None)
+        """
+        await install_script(page=self._page, name=name, script=script)
+
     @property
     def page(self) -> playwright.async_api.Page:
         return self._page
@@ -23,4 +57,4 @@ class Handler(abc.ABC):
         return self._debug_tool
 
 
-__all__ = ['Handler']
+__all__ = ['Handler', 'install_script']
@@ -1,43 +1,158 @@
 import asyncio
+import logging
 from typing import List, Callable
 
 import playwright.async_api
-from gembox.debug_utils import Debugger
 
-from .common_handler import CommonHandler
 from .handler import Handler
 
+# scroll helpers installed once per page, so each call only ships a short `window.__quokka_scroll.*` expression
+_QUOKKA_SCROLL_JS = """(() => {
+    if (window.__quokka_scroll) return;
+    const s = {
+        toBottom: el => { if (el) { el.scrollTop = el.scrollHeight; } else { window.scrollTo(0, document.body.scrollHeight); } },
+        toTop: el => { if (el) { el.scrollTop = 0; } else { window.scrollTo(0, 0); } },
+        by: (x, y, el) => { if (el) { el.scrollLeft += x; el.scrollTop += y; } else { window.scrollBy(x, y); } },
+        to: (x, y, el) => { if (el) { el.scrollLeft = x; el.scrollTop = y; } else { window.scrollTo(x, y); } },
+        top: el => el ? el.scrollTop : window.scrollY,
+        height: el => el ? el.scrollHeight : document.body.scrollHeight,
+    };
+    // selector counts are memoized until the next DOM mutation, so repeated counts on a settled page are O(1). Selectors
+    // with pseudo-classes are not, as `:checked`, `:focus`... change without any DOM mutation
+    const counts = new Map();
+    let observer = null;
+    s.count = sel => {
+        if (observer === null && document.documentElement) {
+            observer = new MutationObserver(() => counts.clear());
+            observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+        }
+        if (observer !== null && observer.takeRecords().length > 0) counts.clear();
+        let n = counts.get(sel);
+        if (n === undefined) {
+            n = document.querySelectorAll(sel).length;
+            if (observer !== null && !sel.includes(':')) counts.set(sel, n);
+        }
+        return n;
+    };
+    // Playwright-only selectors (`text=`, `xpath=`, `>>`, `:has-text()`...) are not valid CSS, the caller counts those
+    s.isCss = sel => { try { document.createDocumentFragment().querySelector(sel); return true; } catch (e) { return false; } };
+    // read scroll top, scroll height and the selector count (if any) together in one layout pass, `n` is null if the
+    // selector is not CSS
+    s.state = (sel, el) => ({top: s.top(el), h: s.height(el), n: sel === null ? -1 : (s.isCss(sel) ? s.count(sel) : null)});
+    // count the selector (if any), scroll one step, then read scroll top and height
+    s.probe = (step, sel, el) => {
+        const n = sel === null ? -1 : s.count(sel);
+        if (step === null) { s.toBottom(el); } else { s.by(0, step, el); }
+        return {top: s.top(el), h: s.height(el), n: n};
+    };
+    window.__quokka_scroll = s;
+})()"""
+
+_MAX_WAIT_BACKOFF = 16
+"""the maximum factor by which `load_wait` is stretched while the scroll is stalled"""
+
+_WAIT_STRATEGIES = ("sleep", "networkidle")
+
+_NETWORK_QUIET_MS = 50
+"""with `wait_strategy="networkidle"`, the network is idle once no request has been in flight for this long"""
+
+_NETWORK_MIN_WAIT_MS = 100
+"""with `wait_strategy="networkidle"`, the minimum wait after each scroll, the fetch of an infinite-scroll handler
+usually starts a frame or more after the scroll"""
+
+_COUNT_REACHED_JS = "([sel, n]) => window.__quokka_scroll.count(sel) >= n"
+
+_IS_CSS_JS = "sel => window.__quokka_scroll.isCss(sel)"
+
+
+class _InflightRequests:
+    """
+    Track the requests in flight on a page, to wait for the network to become idle after a scroll.
+
+    `page.wait_for_load_state('networkidle')` cannot be used for this: the load state is reached once after loading,
+    and it returns immediately afterwards, even while requests triggered by scrolling are in flight.
+    """
+
+    def __init__(self, page: playwright.async_api.Page):
+        self._page = page
+        self._n_inflight = 0
+        self._last_change = 0.
+        self._changed = asyncio.Event()
+
+    def attach(self):
+        self._last_change = asyncio.get_running_loop().time()
+        self._page.on("request", self._on_request)
+        self._page.on("requestfinished", self._on_request_done)
+        self._page.on("requestfailed", self._on_request_done)
+
+    def detach(self):
+        self._page.remove_listener("request", self._on_request)
+        self._page.remove_listener("requestfinished", self._on_request_done)
+        self._page.remove_listener("requestfailed", self._on_request_done)
+
+    def mark(self):
+        """
+        Start the quiet period now, call it when scrolling, so the requests the scroll triggers are waited for.
+        """
+        self._touch()
+
+    def _on_request(self, _request):
+        self._n_inflight += 1
+        self._touch()
+
+    def _on_request_done(self, _request):
+        self._n_inflight = max(0, self._n_inflight - 1)
+        self._touch()
+
+    def _touch(self):
+        self._last_change = asyncio.get_running_loop().time()
+        self._changed.set()
+
+    async def wait_idle(self, quiet: float, timeout: float, min_wait: float = 0.) -> bool:
+        """
+        Wait until no request has been in flight for `quiet` seconds, at least `min_wait` and at most `timeout` seconds.
+
+        :param quiet: (float) the quiet period, in seconds
+        :param timeout: (float) the maximum time to wait, in seconds
+        :param min_wait: (float) the minimum time to wait, in seconds
+        :return: (bool) True if the network became idle before the timeout
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + timeout
+        earliest = start + min(min_wait, timeout)
+        while True:
+            now = loop.time()
+            if self._n_inflight == 0 and now - self._last_change >= quiet and now >= earliest:
+                return True
+            if now >= deadline:
+                return False
+            wait = deadline - now
+            if self._n_inflight == 0:
+                wait = min(wait, max(quiet - (now - self._last_change), earliest - now))
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
 
-class ScrollHandler(Handler):
-    def __init__(self, page: playwright.async_api.Page, debug_tool: Debugger):
-        super(ScrollHandler, self).__init__(page=page, debug_tool=debug_tool)
-        self._common_handler = CommonHandler(page=page, debug_tool=debug_tool)
 
+class ScrollHandler(Handler):
     async def scroll_to_bottom(self, elem: playwright.async_api.ElementHandle = None):
-        if elem:
-            await self._page.evaluate("elem => elem.scrollTop = elem.scrollHeight", elem)
-        else:
-            await self._page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        await self._install_scroll_helpers()
+        await self._page.evaluate("el => window.__quokka_scroll.toBottom(el)", elem)
 
     async def scroll_to_top(self, elem: playwright.async_api.ElementHandle = None):
-        if elem:
-            await self._page.evaluate("elem => elem.scrollTop = 0", elem)
-        else:
-            await self._page.evaluate("window.scrollTo(0, 0)")
+        await self._install_scroll_helpers()
+        await self._page.evaluate("el => window.__quokka_scroll.toTop(el)", elem)
 
     async def scroll_by(self, x: int, y: int, elem: playwright.async_api.ElementHandle = None):
-        if elem:
-            await self._page.evaluate("args => { args.elem.scrollLeft += args.x; args.elem.scrollTop += args.y; }",
-                                      {"elem": elem, "x": x, "y": y})
-        else:
-            await self._page.evaluate("args => window.scrollBy(args.x, args.y)", {"x": x, "y": y})
+        await self._install_scroll_helpers()
+        await self._page.evaluate("a => window.__quokka_scroll.by(a.x, a.y, a.elem)", {"elem": elem, "x": x, "y": y})
 
     async def scroll_to(self, x: int, y: int, elem: playwright.async_api.ElementHandle = None):
-        if elem:
-            await self._page.evaluate("args => { args.elem.scrollLeft = args.x; args.elem.scrollTop = args.y; }",
-                                      {"elem": elem, "x": x, "y": y})
-        else:
-            await self._page.evaluate("args => window.scrollTo(args.x, args.y)", {"x": x, "y": y})
+        await self._install_scroll_helpers()
+        await self._page.evaluate("a => window.__quokka_scroll.to(a.x, a.y, a.elem)", {"elem": elem, "x": x, "y": y})
 
     async def get_scroll_height(self, elem: playwright.async_api.ElementHandle = None) -> int:
         """
@@ -46,10 +161,8 @@ class ScrollHandler(Handler):
         :param elem: ElementHandle of the specific element or None for the whole page.
         :return: Scroll height.
         """
-        if elem:
-            return await self._page.evaluate("elem => elem.scrollHeight", elem)
-        else:
-            return await self._page.evaluate("document.body.scrollHeight")
+        await self._install_scroll_helpers()
+        return await self._page.evaluate("el => window.__quokka_scroll.height(el)", elem)
 
     async def get_scroll_top(self, elem: playwright.async_api.ElementHandle = None) -> int:
         """
@@ -58,18 +171,31 @@ class ScrollHandler(Handler):
         :param elem: ElementHandle of the specific element or None for the whole page.
         :return: Current scroll position from the top.
         """
-        if elem:
-            return await self._page.evaluate("elem => elem.scrollTop", elem)
-        else:
-            # You can also use `window.pageYOffset` which is equivalent to `window.scrollY`.
-            return await self._page.evaluate("window.scrollY")
+        await self._install_scroll_helpers()
+        return await self._page.evaluate("el => window.__quokka_scroll.top(el)", elem)
+
+    async def get_scroll_state(self, selector: str = None, elem: playwright.async_api.ElementHandle = None) -> dict:
+        """
+        Get the scroll top, the scroll height and the number of elements matching `selector` in a single round-trip.
+
+        :param selector: (str) the selector to count, if None, the count is skipped and `n` is -1
+        :param elem: ElementHandle of the specific element or None for the whole page.
+        :return: (dict) `{'top': scroll top, 'h': scroll height, 'n': number of elements matching selector}`
+        """
+        await self._install_scroll_helpers()
+        state = await self._page.evaluate("a => window.__quokka_scroll.state(a.sel, a.el)", {"sel": selector, "el": elem})
+        # the in-page count cannot evaluate non-CSS selectors, and does not pierce shadow roots (found nothing)
+        if state['n'] is None or (selector is not None and state['n'] == 0):
+            state['n'] = await self._page.locator(selector).count()
+        return state
 
     async def scroll_load(self,
                           scroll_step: int = 400,
                           load_wait: int = 40,
                           same_th: int = 20,
                           scroll_step_callbacks: List[Callable] = None,
-                          elem: playwright.async_api.ElementHandle = None) -> None:
+                          elem: playwright.async_api.ElementHandle = None,
+                          wait_strategy: str = "sleep") -> None:
         """
         Scroll and load all contents, until scrolling top does not change.
 
@@ -78,10 +204,11 @@ class ScrollHandler(Handler):
         :param same_th: (int) The threshold of the number of same scroll top to stop scrolling.
         :param scroll_step_callbacks: (List[Callable]) A callback function to be called after each scroll.
         :param elem: (playwright.async_api.ElementHandler) The element to scroll. If None, scroll the whole page.
+        :param wait_strategy: (str) How to wait after each scroll, "sleep" waits `load_wait` ms, "networkidle" waits until no request is in flight, at most `load_wait` ms.
         :return:
         """
         self.debug_tool.info(f"Scrolling and loading... scroll_step: {scroll_step}, load_wait: {load_wait}, same_th: {same_th}, elem: {elem}")
-        return await self._scroll_load(scroll_step=scroll_step, load_wait=load_wait, same_th=same_th, scroll_step_callbacks=scroll_step_callbacks, elem=elem)
+        return await self._scroll_load(scroll_step=scroll_step, load_wait=load_wait, same_th=same_th, scroll_step_callbacks=scroll_step_callbacks, elem=elem, wait_strategy=wait_strategy)
 
     async def scroll_load_selector(self,
                                    selector: str,
@@ -92,7 +219,8 @@ class ScrollHandler(Handler):
                                    scroll_step_callbacks: List[Callable] = None,
                                    log_interval: int = 100,
                                    count_check_interval: int = 5,
-                                   elem: playwright.async_api.ElementHandle = None) -> List[playwright.async_api.ElementHandle]:
+                                   elem: playwright.async_api.ElementHandle = None,
+                                   wait_strategy: str = "sleep") -> List[playwright.async_api.ElementHandle]:
         """
         Scroll and load all contents, until no new content is loaded or enough specific items are collected.
 
@@ -105,18 +233,59 @@ class ScrollHandler(Handler):
         :param log_interval: (int) The interval of logging the number of loaded elements.
         :param count_check_interval: (int) The interval of checking the number of elements.
         :param elem: (ElementHandle) The element to scroll. If None, scroll the whole page.
+        :param wait_strategy: (str) How to wait after each scroll, "sleep" waits `load_wait` ms, "networkidle" waits until no request is in flight, at most `load_wait` ms.
 
         :return: (int) The number of elements matching the selector
         """
         self.debug_tool.info(f'Scrolling and loading {selector}... threshold: {threshold}, scroll_step: {scroll_step}, load_wait: {load_wait}, same_th: {same_th}, elem: {elem}')
         await self._scroll_load(selector=selector, threshold=threshold, scroll_step=scroll_step, load_wait=load_wait,
                                 same_th=same_th, scroll_step_callbacks=scroll_step_callbacks, log_interval=log_interval,
-                                elem=elem, count_check_interval=count_check_interval)
-        elements = await self._common_handler.get_elements(selector=selector)
-        n_elements = len(elements)
-        self.debug_tool.info(f'Loaded {n_elements} elements')
+                                elem=elem, count_check_interval=count_check_interval,
+                                wait_strategy=wait_strategy)
+        elements = await self._page.query_selector_all(selector)
+        self.debug_tool.info(f'Loaded {len(elements)} elements')
         return elements
 
+    async def scroll_load_selector_attrs(self,
+                                         selector: str,
+                                         attr: str,
+                                         threshold: int = None,
+                                         scroll_step: int = 400,
+                                         load_wait: int = 40,
+                                         same_th: int = 20,
+                                         scroll_step_callbacks: List[Callable] = None,
+                                         log_interval: int = 100,
+                                         count_check_interval: int = 5,
+                                         elem: playwright.async_api.ElementHandle = None,
+                                         wait_strategy: str = "sleep") -> List[str]:
+        """
+        Same as `scroll_load_selector`, but extract `attr` of the loaded elements inside the page.
+
+        Use it when you only need the data of the elements, it skips materializing an ElementHandle per element.
+
+        :param selector: (str) The selector of the elements to load
+        :param attr: (str) The attribute to extract from each loaded element
+        :param threshold: (int) after loading `threshold` number of elements, the method will stop scrolling
+        :param scroll_step: (int) The scroll step in pixels. If none, each scroll will be `scroll_to_bottom`
+        :param load_wait: (int) The time to wait after each scroll, in milliseconds.
+        :param same_th: (int) The threshold of the number of same scroll top to stop scrolling.
+        :param scroll_step_callbacks: (Callable) A callback function to be called after each scroll.
+        :param log_interval: (int) The interval of logging the number of loaded elements.
+        :param count_check_interval: (int) The interval of checking the number of elements.
+        :param elem: (ElementHandle) The element to scroll. If None, scroll the whole page.
+        :param wait_strategy: (str) How to wait after each scroll, "sleep" waits `load_wait` ms, "networkidle" waits until no request is in flight, at most `load_wait` ms.
+
+        :return: (List[str]) The attribute values of the elements matching the selector
+        """
+        self.debug_tool.info(f'Scrolling and loading {selector}[{attr}]... threshold: {threshold}, scroll_step: {scroll_step}, load_wait: {load_wait}, same_th: {same_th}, elem: {elem}')
+        await self._scroll_load(selector=selector, threshold=threshold, scroll_step=scroll_step, load_wait=load_wait,
+                                same_th=same_th, scroll_step_callbacks=scroll_step_callbacks, log_interval=log_interval,
+                                elem=elem, count_check_interval=count_check_interval,
+                                wait_strategy=wait_strategy)
+        values = await self._page.eval_on_selector_all(selector, "(els, a) => els.map(e => e.getAttribute(a))", attr)
+        self.debug_tool.info(f'Loaded {len(values)} elements')
+        return values
+
     async def _scroll_load(self,
                            selector: str = None,
                            scroll_step: int = None,
@@ -126,7 +295,8 @@ class ScrollHandler(Handler):
                            scroll_step_callbacks: List[Callable] = None,
                            log_interval: int = 100,
                            count_check_interval: int = 5,
-                           elem: playwright.async_api.ElementHandle = None):
+                           elem: playwright.async_api.ElementHandle = None,
+                           wait_strategy: str = "sleep"):
         """
         Scroll and load all contents.
 
@@ -144,75 +314,165 @@ class ScrollHandler(Handler):
         :param log_interval: (int) The interval of logging the number of loaded elements.
         :param count_check_interval: (int) The interval of checking the number of elements.
         :param elem: (ElementHandler) The element to scroll. If None, scroll the whole page.
+        :param wait_strategy: (str) How to wait after each scroll, "sleep" waits `load_wait` ms, "networkidle" waits until no request is in flight, at most `load_wait` ms.
         :return:
         """
+        assert wait_strategy in _WAIT_STRATEGIES, f"wait_strategy must be one of {_WAIT_STRATEGIES}, got {wait_strategy}"
         same_count = 0
-        last_top = None
+        last_state = None
+        current_wait = load_wait
         count_check_counter = 0
         n_selector, prev_n_selector = 0, 0
         same_sel_count, same_sel_count_th = 0, 10
-
-        while True:
-            if selector is not None:
-                count_check_counter += 1
-
-                if count_check_counter >= count_check_interval:
-                    n_selector = await self._common_handler.count(selector=selector)
-                    count_check_counter = 0
+        # check the callback kinds and get the loop once, rather than on every scroll tick
+        callbacks = [(callback, asyncio.iscoroutinefunction(callback)) for callback in (scroll_step_callbacks or [])]
+        loop = asyncio.get_running_loop()
+        # skip building the log messages of the hot loop when info logging is off (the default)
+        info_on = self.debug_tool.logger.isEnabledFor(logging.INFO)
+        # bind what the loop calls on every tick once, and install the helpers the probe relies on up front
+        debug_info = self.debug_tool.info
+        scroll_and_probe = self._scroll_and_probe
+        await self._install_scroll_helpers()
+        # CSS selectors are counted by the probe, the others (only understood by Playwright) through a locator, as well
+        # as CSS selectors the probe finds nothing for, since it does not pierce shadow roots
+        css_selector = selector is not None and await self._page.evaluate(_IS_CSS_JS, selector)
+        count_locator = self._page.locator(selector) if selector is not None else None
+
+        network = _InflightRequests(self._page) if wait_strategy == "networkidle" else None
+        if network is not None:
+            network.attach()
+        try:
+            while True:
+                sample_count = False
+                if selector is not None:
+                    count_check_counter += 1
+                    if count_check_counter >= count_check_interval:
+                        sample_count = True
+                        count_check_counter = 0
+
+                n_sampled = await count_locator.count() if sample_count and not css_selector else -1
+                if network is not None:
+                    network.mark()
+                # count (if sampling this tick), scroll and read scroll top in one round-trip
+                probe = await scroll_and_probe(scroll_step=scroll_step, selector=selector if sample_count and css_selector else None, elem=elem)
+                top, height = probe['top'], probe['h']
+                if probe['n'] > 0:
+                    n_sampled = probe['n']
+                elif probe['n'] == 0:
+                    n_sampled = await count_locator.count()
+
+                if n_sampled >= 0:
+                    n_selector = n_sampled
 
                     if n_selector == prev_n_selector:
                         same_sel_count += 1
-                        self.debug_tool.info(f"Same selector count: {same_sel_count}, before: {prev_n_selector}, after: {n_selector}, threshold: {threshold}")
+                        if info_on:
+                            debug_info(f"Same selector count: {same_sel_count}, before: {prev_n_selector}, after: {n_selector}, threshold: {threshold}")
                     else:
-                        self.debug_tool.info(f"Current n_selector: {n_selector}, previous n_selector: {prev_n_selector}, threshold: {threshold} , same selector count: {same_sel_count} / {same_sel_count_th}")
+                        if info_on:
+                            debug_info(f"Current n_selector: {n_selector}, previous n_selector: {prev_n_selector}, threshold: {threshold} , same selector count: {same_sel_count} / {same_sel_count_th}")
                         same_sel_count = 0
                         prev_n_selector = n_selector
 
                     if same_sel_count >= same_sel_count_th:
-                        self.debug_tool.info(f"Same selector count: {same_sel_count}, same_sel_count_th: {same_sel_count_th}, stopping!! count: {n_selector}, threshold: {threshold}")
+                        if info_on:
+                            debug_info(f"Same selector count: {same_sel_count}, same_sel_count_th: {same_sel_count_th}, stopping!! count: {n_selector}, threshold: {threshold}")
                         break
 
                     if threshold is not None and n_selector >= threshold:
-                        self.debug_tool.info(f'Loaded {n_selector} elements, reached threshold {threshold}, stopping.')
+                        if info_on:
+                            debug_info(f'Loaded {n_selector} elements, reached threshold {threshold}, stopping.')
                         break
 
                     elif n_selector - prev_n_selector >= log_interval:
-                        self.debug_tool.info(f'Loaded {n_selector} elements so far, threshold: {threshold}.')
+                        if info_on:
+                            debug_info(f'Loaded {n_selector} elements so far, threshold: {threshold}.')
                         prev_n_selector = n_selector
 
-            await self._scroll_step(elem=elem, scroll_step=scroll_step)
-
-            # Calling callbacks
-            if scroll_step_callbacks:
-                for callback in scroll_step_callbacks:
-                    if asyncio.iscoroutinefunction(callback):
-                        await callback()
-                    else:
-                        callback()
-
-            await asyncio.sleep(load_wait / 1000.)
+                # Calling callbacks concurrently, sync callbacks run in the default executor to not block the event loop
+                if callbacks:
+                    await asyncio.gather(*[callback() if is_coroutine else loop.run_in_executor(None, callback)
+                                           for callback, is_coroutine in callbacks])
+
+                wait_start = loop.time()
+                if network is not None:
+                    # wait until the requests triggered by the scroll are done, `current_wait` is only the cap
+                    await network.wait_idle(quiet=_NETWORK_QUIET_MS / 1000., timeout=current_wait / 1000.,
+                                            min_wait=_NETWORK_MIN_WAIT_MS / 1000.)
+                elif css_selector and threshold is not None and load_wait > 0:
+                    # wait in-page instead of sleeping, so reaching the threshold ends the wait (and the loop) early
+                    if await self._wait_for_count(selector=selector, threshold=threshold, timeout=current_wait):
+                        if info_on:
+                            debug_info(f'Loaded at least {threshold} elements, reached threshold {threshold}, stopping.')
+                        break
+                else:
+                    # also reached with `load_wait=0`, where `sleep(0)` still yields to the other tasks of the loop
+                    await asyncio.sleep(current_wait / 1000.)
+                waited = (loop.time() - wait_start) * 1000.
+
+                # the page state is settled when neither the scroll position, the scroll height nor the number of
+                # loaded elements (last sampled) has changed since the previous tick
+                state = (top, height, n_selector)
+                if state == last_state:
+                    # back off while stalled, each stalled tick counts as many `load_wait`s as it actually waited,
+                    # so the loop probes less often without waiting longer in total
+                    same_count += waited / load_wait if load_wait > 0 else 1
+                    if info_on:
+                        debug_info(f"Same top count: {same_count}, same_threshold: {same_th}, top = {top}, wait = {current_wait}")
+                    if same_count >= same_th:
+                        if info_on:
+                            debug_info(f'Top unchanged for {same_count} times, stopping.')
+                        break
+                    if same_count >= 2:
+                        current_wait = min(current_wait * 2, load_wait * _MAX_WAIT_BACKOFF)
+                else:
+                    same_count = 0
+                    current_wait = load_wait
+
+                last_state = state
+        finally:
+            if network is not None:
+                network.detach()
+
+    async def _scroll_and_probe(self,
+                                scroll_step: int = None,
+                                selector: str = None,
+                                elem: playwright.async_api.ElementHandle = None) -> dict:
+        """
+        Count the elements matching `selector`, scroll one step and read the scroll top and height, all in a single evaluate.
 
-            top = await self.get_scroll_top(elem=elem)
+        :param scroll_step: (int) the scroll step in pixels, if None, scroll to bottom
+        :param selector: (str) the CSS selector to count, if None, the count is skipped and `n` is -1
+        :param elem: (ElementHandle) The element to scroll. If None, scroll the whole page.
+        :return: (dict) `{'top': scroll top, 'h': scroll height, 'n': number of elements matching selector}`
 
-            if top == last_top:
-                same_count += 1
-                self.debug_tool.info(f"Same top count: {same_count}, same_threshold: {same_th}, top = {top}")
-                if same_count >= same_th:
-                    self.debug_tool.info(f'Top unchanged for {same_count} times, stopping.')
-                    break
-            else:
-                same_count = 0
+        **Note: the scroll helpers must be installed, `_scroll_load` installs them before its loop**
+        """
+        if elem is not None:
+            # evaluate on the handle itself, so it is the bound first argument instead of being walked in the args
+            return await elem.evaluate("(el, a) => window.__quokka_scroll.probe(a.step, a.sel, el)",
+                                       {"step": scroll_step, "sel": selector})
+        return await self._page.evaluate("a => window.__quokka_scroll.probe(a.step, a.sel, null)",
+                                         {"step": scroll_step, "sel": selector})
 
-            last_top = top
+    async def _install_scroll_helpers(self):
+        await self._install_script(name="quokka_scroll", script=_QUOKKA_SCROLL_JS)
 
-    async def _scroll_step(self, scroll_step: int = None, elem: playwright.async_api.ElementHandle = None):
+    async def _wait_for_count(self, selector: str, threshold: int, timeout: int) -> bool:
         """
-        Scroll by `scroll_step` pixels, if scroll_step is `None`, scroll to bottom.
+        Wait inside the page until at least `threshold` elements match `selector`.
+
+        :param selector: (str) the CSS selector to count
+        :param threshold: (int) the number of elements to wait for
+        :param timeout: (int) the maximum time to wait, in milliseconds
+        :return: (bool) True if the threshold is reached before the timeout
         """
-        if scroll_step is None:
-            await self.scroll_to_bottom(elem=elem)
-        else:
-            await self.scroll_by(0, scroll_step, elem=elem)
+        await self._install_scroll_helpers()
+        try:
+            await self._page.wait_for_function(_COUNT_REACHED_JS, arg=[selector, threshold], timeout=timeout)
+            return True
+        except playwright.async_api.TimeoutError:
+            return False
 
 
 __all__ = ['ScrollHandler']